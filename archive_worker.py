@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+
+from plugins.archive.worker import run_archive_worker
+from plugins.common import AppContext
+from shared.config import get_settings
+from shared.database import get_session_factory, init_database
+
+
+def main() -> None:
+    settings = get_settings()
+    logging.basicConfig(
+        level = logging.DEBUG if settings.debug else logging.INFO,
+        format = "%(asctime)s %(levelname)s %(name)s - %(message)s",
+    )
+    init_database(settings.database_url, echo = settings.sql_echo)
+    ctx = AppContext(
+        settings = settings,
+        session_factory = get_session_factory(),
+    )
+    consumer = os.getenv("ARCHIVE_WORKER_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+    asyncio.run(run_archive_worker(ctx, consumer))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
-import hashlib
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-import shutil
-import time
+from typing import AsyncIterator
 
 from ncatbot.core import BotClient
-from ncatbot.core.event import GroupMessageEvent
+from ncatbot.core.event import GroupMessageEvent, MetaEvent
 from ncatbot.core.event.message_segment import File
 
+from plugins.archive.lanes import ArchiveLanes
+from plugins.archive.pipeline import (
+    ArchiveRequest,
+    StagedArchive,
+    commit_archives,
+    stage_archive,
+    to_long_candidates,
+    url_fetcher,
+)
 from plugins.common import AppContext
+from shared.services.archive_queue_service import ArchiveJob
 
 LOGGER = logging.getLogger(__name__)
 
 
 def register_archive_handlers(bot: BotClient, ctx: AppContext) -> None:
+    lanes = ArchiveLanes(ctx.settings)
+
     def _source_file_name(file_seg: File, fallback: str = "unknown.bin") -> str:
         name = ""
         try:
@@ -29,24 +41,6 @@ def register_archive_handlers(bot: BotClient, ctx: AppContext) -> None:
         normalized = Path(name).name.strip()
         return normalized or fallback
 
-    def _to_long_candidates(raw: bytes) -> list[str]:
-        if len(raw) < 8:
-            return []
-        head = raw[:8]
-        values: list[str] = []
-        seen: set[str] = set()
-        for byteorder in ("big", "little"):
-            for signed in (False, True):
-                try:
-                    item = str(int.from_bytes(head, byteorder = byteorder, signed = signed))
-                except Exception:
-                    continue
-                if item in seen:
-                    continue
-                seen.add(item)
-                values.append(item)
-        return values
-
     def _extract_segment_md5_candidates(file_seg: File) -> list[str]:
         raw = getattr(file_seg, "md5", None)
         if raw is None:
@@ -55,7 +49,7 @@ def register_archive_handlers(bot: BotClient, ctx: AppContext) -> None:
         if isinstance(raw, int):
             return [str(raw)]
         if isinstance(raw, (bytes, bytearray)):
-            return _to_long_candidates(bytes(raw))
+            return to_long_candidates(bytes(raw))
         if isinstance(raw, str):
             value = raw.strip().strip("'\"")
             if not value:
@@ -68,128 +62,108 @@ def register_archive_handlers(bot: BotClient, ctx: AppContext) -> None:
                 except ValueError:
                     raw_bytes = b""
                 if raw_bytes:
-                    candidates.extend(_to_long_candidates(raw_bytes))
+                    candidates.extend(to_long_candidates(raw_bytes))
             return candidates
         return []
 
-    def _file_md5(path: Path) -> tuple[str, bytes]:
-        digest = hashlib.md5()
-        with path.open("rb") as f:
-            for chunk in iter(lambda: f.read(1024 * 1024), b""):
-                digest.update(chunk)
-        return digest.hexdigest(), digest.digest()
+    def _segment_size(file_seg: File) -> int:
+        try:
+            return int(getattr(file_seg, "file_size", 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    async def _enqueue(event: GroupMessageEvent, file_seg: File, source_name: str) -> bool:
+        url = str(getattr(file_seg, "url", "") or "").strip()
+        if not url.startswith(("http://", "https://")):
+            return False
+        job = ArchiveJob(
+            url = url,
+            name = source_name,
+            sender_id = str(event.user_id),
+            group_id = str(event.group_id),
+            message_id = str(event.message_id),
+            md5_candidates = _extract_segment_md5_candidates(file_seg),
+            size = _segment_size(file_seg),
+        )
+        try:
+            entry_id = await ctx.archive_queue_service().enqueue(job)
+        except Exception:
+            # 队列不可用时回退到进程内处理，保证文件不丢
+            LOGGER.exception("enqueue archive job failed, fallback to inline: name=%s", source_name)
+            return False
+        LOGGER.info("archive job queued: entry=%s group_id=%s file=%s", entry_id, event.group_id, source_name)
+        return True
+
+    @asynccontextmanager
+    async def _file_slot(semaphore: asyncio.Semaphore, source_name: str, size: int) -> AsyncIterator[None]:
+        async with semaphore, lanes.slot(source_name, size):
+            yield
+
+    @bot.on_startup()
+    async def on_archive_startup(event: MetaEvent) -> None:
+        try:
+            await ctx.archive_cache_service().startup()
+        except Exception:
+            LOGGER.exception("archive cache startup cleanup failed")
 
     @bot.on_group_message(filter=File)
     async def on_archive_file(event: GroupMessageEvent) -> None:
         if event.group_id not in ctx.settings.archive_groups:
             return
 
-        archive_dir = Path(ctx.settings.archive_tmp_dir)
-        archive_dir.mkdir(parents=True, exist_ok=True)
-
         files = event.message.filter(File)
         if not files:
             return
 
-        archived_names: list[str] = []
+        inline_files: list[tuple[File, str]] = []
         for file_seg in files:
-            uploaded_key = ""
-            local_file: Path | None = None
             source_name = _source_file_name(file_seg)
-            temporary_files: list[Path] = []
-            retained_temp_paths: set[Path] = set()
+            if ctx.settings.archive_queue_enabled and await _enqueue(event, file_seg, source_name):
+                continue
+            inline_files.append((file_seg, source_name))
+        if not inline_files:
+            return
+
+        # 同一消息内的多个文件并发处理，整体耗时接近最大文件而非总和
+        semaphore = asyncio.Semaphore(max(1, ctx.settings.archive_message_concurrency))
+
+        async def _stage(file_seg: File, source_name: str) -> StagedArchive | None:
+            async def _fetch_segment(directory: Path, name: str) -> str:
+                return await file_seg.download_to(str(directory), name = name)
+
+            request = ArchiveRequest(
+                source_name = source_name,
+                sender_id = str(event.user_id),
+                group_id = str(event.group_id),
+                message_id = str(event.message_id),
+                origin_url = getattr(file_seg, "url", "") or "",
+                segment_md5_candidates = _extract_segment_md5_candidates(file_seg),
+                size = _segment_size(file_seg),
+            )
+            # 有直链时走分块/续传下载，避免 download_to 把整个文件读进内存
+            if request.origin_url.startswith(("http://", "https://")):
+                fetch = url_fetcher(ctx, request)
+            else:
+                fetch = _fetch_segment
             try:
-                download_name = f"{time.time_ns()}-{source_name}"
-                local_path = await file_seg.download_to(str(archive_dir), name = download_name)
-                local_file = Path(local_path)
-                file_size = local_file.stat().st_size
-
-                md5, md5_bytes = _file_md5(local_file)
-                md5_candidates = [md5]
-                md5_candidates.extend(_to_long_candidates(md5_bytes))
-                md5_candidates.extend(_extract_segment_md5_candidates(file_seg))
-                # 去重并保序
-                uniq_candidates: list[str] = []
-                seen_candidates: set[str] = set()
-                for item in md5_candidates:
-                    value = str(item).strip()
-                    if not value or value in seen_candidates:
-                        continue
-                    seen_candidates.add(value)
-                    uniq_candidates.append(value)
-
-                duplicated = await ctx.archive_service().get_by_md5_candidates(uniq_candidates)
-                enabled = 1 if duplicated else 0
-
-                processed = ctx.file_processor_service().prepare_for_archive(local_file)
-                archive_input = processed.archive_source
-                temporary_files = processed.temp_files
-
-                archive_url = str(archive_input)
-                if ctx.r2_service().enabled:
-                    uploaded_key, remote_url = await ctx.r2_service().upload(
-                        str(archive_input),
-                        object_name = source_name,
-                    )
-                    archive_url = remote_url
-                else:
-                    # 无 R2 时，归档落地文件名也必须保持源文件名，避免暴露临时前缀和 .wm 后缀。
-                    local_store_dir = archive_dir / "stored" / str(time.time_ns())
-                    local_store_dir.mkdir(parents=True, exist_ok=True)
-                    local_archive_path = local_store_dir / source_name
-                    if archive_input != local_archive_path:
-                        shutil.move(str(archive_input), str(local_archive_path))
-                    archive_url = str(local_archive_path)
-                    retained_temp_paths.add(local_archive_path)
-
-                saved = await ctx.archive_service().save_archive(
-                    file_name=source_name,
-                    archive_url=archive_url,
-                    sender_id=str(event.user_id),
-                    size=file_size,
-                    md5=md5,
-                    origin_url=getattr(file_seg, "url", "") or "",
-                    enabled=enabled,
-                )
-                await ctx.meilisearch_service().index_archived_file(saved)
-                try:
-                    await ctx.query_log_service().close_pending_by_archive(
-                        archive_name=saved.name,
-                        archive_url=saved.archive_url,
-                    )
-                except Exception:
-                    LOGGER.exception("close pending query log failed for archive_id=%s", saved.id)
-                archived_names.append(source_name)
+                return await stage_archive(ctx, request, fetch, _file_slot(semaphore, source_name, request.size))
             except Exception:
-                LOGGER.exception("archive file failed: group_id=%s message_id=%s", event.group_id, event.message_id)
-                if uploaded_key:
-                    try:
-                        await ctx.r2_service().delete(uploaded_key)
-                    except Exception:
-                        LOGGER.exception("rollback r2 object failed: key=%s", uploaded_key)
-            finally:
-                for tmp_path in temporary_files:
-                    if tmp_path in retained_temp_paths:
-                        continue
-                    try:
-                        tmp_path.unlink(missing_ok=True)
-                    except Exception:
-                        LOGGER.debug("remove temporary watermark file failed: %s", tmp_path)
-
-                if (
-                    local_file is not None
-                    and ctx.r2_service().enabled
-                    and not ctx.settings.archive_keep_local_copy
-                ):
-                    try:
-                        local_file.unlink(missing_ok=True)
-                    except Exception:
-                        LOGGER.debug("remove local tmp failed: %s", local_file)
-
-        if archived_names:
+                LOGGER.exception(
+                    "archive file failed: group_id=%s message_id=%s file=%s",
+                    event.group_id,
+                    event.message_id,
+                    source_name,
+                )
+                return None
+
+        results = await asyncio.gather(*(_stage(seg, name) for seg, name in inline_files))
+        staged_items = [item for item in results if item is not None]
+        saved, _ = await commit_archives(ctx, staged_items)
+
+        if saved:
             LOGGER.info(
                 "archive completed: group_id=%s message_id=%s files=%s",
                 event.group_id,
                 event.message_id,
-                ",".join(archived_names),
+                ",".join(item.name for item in saved),
             )
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+from shared.config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+_ARCHIVE_SUFFIXES = {".zip", ".7z", ".rar"}
+
+LANE_FAST = "fast"
+LANE_NORMAL = "normal"
+LANE_SLOW = "slow"
+
+
+class ArchiveLanes:
+    """按文件大小/类型分道处理，每条道独立并发预算，避免小文件排在大压缩包之后。"""
+
+    def __init__(self, settings: Settings) -> None:
+        self._fast_max_bytes = max(0, settings.archive_fast_lane_max_mb) * _MB
+        self._slow_min_bytes = max(0, settings.archive_slow_lane_min_mb) * _MB
+        self._semaphores = {
+            LANE_FAST: asyncio.Semaphore(max(1, settings.archive_fast_lane_concurrency)),
+            LANE_NORMAL: asyncio.Semaphore(max(1, settings.archive_normal_lane_concurrency)),
+            LANE_SLOW: asyncio.Semaphore(max(1, settings.archive_slow_lane_concurrency)),
+        }
+
+    def pick(self, file_name: str, size: int) -> str:
+        # 发送前无法得知大小（size=0）时走普通道
+        if size <= 0:
+            return LANE_NORMAL
+        if self._slow_min_bytes and size >= self._slow_min_bytes:
+            return LANE_SLOW
+        suffix = Path(file_name).suffix.lower()
+        if size <= self._fast_max_bytes and suffix not in _ARCHIVE_SUFFIXES:
+            return LANE_FAST
+        return LANE_NORMAL
+
+    @asynccontextmanager
+    async def slot(self, file_name: str, size: int) -> AsyncIterator[str]:
+        lane = self.pick(file_name, size)
+        started = time.monotonic()
+        async with self._semaphores[lane]:
+            waited = time.monotonic() - started
+            if waited >= 1:
+                LOGGER.info("archive lane wait: lane=%s file=%s size=%s waited=%.1fs", lane, file_name, size, waited)
+            yield lane
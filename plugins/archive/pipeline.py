@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncContextManager, Awaitable, Callable
+
+from plugins.common import AppContext
+from shared.models.archived_file import ArchivedFile
+from shared.services.archive_flight_service import ArchiveFlight, FlightResult
+from shared.config import Settings
+from shared.utils.http_download import DownloadOptions, download_file, is_md5_hex, stream_download
+
+LOGGER = logging.getLogger(__name__)
+
+# (下载目录, 文件名) -> 本地文件路径
+FetchFile = Callable[[Path, str], Awaitable[str]]
+
+
+@dataclass
+class ArchiveRequest:
+    source_name: str
+    sender_id: str
+    group_id: str = ""
+    message_id: str = ""
+    origin_url: str = ""
+    segment_md5_candidates: list[str] = field(default_factory = list)
+    size: int = 0
+
+
+def to_long_candidates(raw: bytes) -> list[str]:
+    if len(raw) < 8:
+        return []
+    head = raw[:8]
+    values: list[str] = []
+    seen: set[str] = set()
+    for byteorder in ("big", "little"):
+        for signed in (False, True):
+            try:
+                item = str(int.from_bytes(head, byteorder = byteorder, signed = signed))
+            except Exception:
+                continue
+            if item in seen:
+                continue
+            seen.add(item)
+            values.append(item)
+    return values
+
+
+def file_md5(path: Path) -> tuple[str, bytes]:
+    digest = hashlib.md5()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest(), digest.digest()
+
+
+def unique_candidates(values: list[str]) -> list[str]:
+    # 去重并保序
+    result: list[str] = []
+    seen: set[str] = set()
+    for item in values:
+        value = str(item).strip()
+        if not value or value in seen:
+            continue
+        seen.add(value)
+        result.append(value)
+    return result
+
+
+def flight_key(request: ArchiveRequest) -> str:
+    # 优先使用消息段 md5；缺失时退化为 大小+文件名
+    if request.segment_md5_candidates:
+        return f"md5:{request.segment_md5_candidates[0]}:{request.size}"
+    if request.size > 0:
+        return f"size:{request.size}:{request.source_name}"
+    return ""
+
+
+def _download_options(settings: Settings) -> DownloadOptions:
+    return DownloadOptions(
+        chunk_size = settings.archive_download_chunk_mb * 1024 * 1024,
+        concurrency = settings.archive_download_concurrency,
+        ranged_threshold = settings.archive_download_ranged_min_mb * 1024 * 1024,
+    )
+
+
+def url_fetcher(ctx: AppContext, request: ArchiveRequest) -> FetchFile:
+    """按 origin_url 下载：大文件分块并发、断点续传（以 flight_key 作为续传标识），并校验大小与 md5。"""
+
+    async def _fetch(directory: Path, name: str) -> str:
+        expected_md5 = ""
+        if ctx.settings.archive_download_verify_md5:
+            expected_md5 = next((v for v in request.segment_md5_candidates if is_md5_hex(v)), "")
+        target = await download_file(
+            request.origin_url,
+            directory / name,
+            _download_options(ctx.settings),
+            expected_size = request.size,
+            expected_md5 = expected_md5,
+            resume_key = flight_key(request),
+        )
+        return str(target)
+
+    return _fetch
+
+
+@dataclass
+class StagedArchive:
+    """已完成下载/水印/上传、尚未入库的归档文件。"""
+
+    request: ArchiveRequest
+    archive_url: str
+    size: int
+    md5: str
+    enabled: int
+    uploaded_key: str = ""
+    local_archive_path: Path | None = None
+    # 复用了其他处理方的结果：对象归对方所有，自己无需回滚
+    shared: bool = False
+    # 自己处理并已发布结果的 flight 键；入库失败时撤回，避免重试复用未入库的结果
+    flight_key: str = ""
+
+    async def rollback(self, ctx: AppContext) -> None:
+        if self.shared:
+            return
+        if self.flight_key:
+            await ctx.archive_flight_service().retract(self.flight_key)
+        if self.uploaded_key:
+            try:
+                await ctx.r2_service().delete(self.uploaded_key)
+            except Exception:
+                LOGGER.exception("rollback r2 object failed: key=%s", self.uploaded_key)
+        if self.local_archive_path is not None:
+            try:
+                await ctx.local_store_service().remove(self.local_archive_path)
+            except Exception:
+                LOGGER.debug("rollback local archive failed: %s", self.local_archive_path)
+
+
+async def stage_archive(
+    ctx: AppContext,
+    request: ArchiveRequest,
+    fetch: FetchFile,
+    slot: AsyncContextManager | None = None,
+) -> StagedArchive:
+    """下载 -> 哈希 -> 查重 -> 水印 -> 上传；失败时回滚已上传对象并抛出异常。
+
+    slot 为实际处理时占用的并发名额（消息内并发、分道）；等待同一文件的其他处理方时不占名额。
+    """
+    flight: ArchiveFlight | None = None
+    key = flight_key(request)
+    if key:
+        # 同一文件被同时发到多个群时，只有第一个真正处理，其余等待并复用其结果
+        flight, shared = await ctx.archive_flight_service().acquire(key)
+        if shared is not None:
+            LOGGER.info("reuse in-flight archive result: file=%s url=%s", request.source_name, shared.archive_url)
+            return StagedArchive(
+                request = request,
+                archive_url = shared.archive_url,
+                size = shared.size,
+                md5 = shared.md5,
+                enabled = 1,
+                shared = True,
+            )
+
+    try:
+        async with slot or contextlib.nullcontext():
+            staged = await _stage_archive(ctx, request, fetch)
+    except BaseException:
+        if flight is not None:
+            await flight.finish(None)
+        raise
+    if flight is not None:
+        # 暂存成功立即发布结果，不等整条消息入库：
+        # 否则两条消息各自持有对方等待的文件（或同一消息内重复的文件）会互相等到超时。
+        # 入库失败时由 rollback 撤回结果
+        await flight.finish(FlightResult(archive_url = staged.archive_url, size = staged.size, md5 = staged.md5))
+        staged.flight_key = flight.key
+    return staged
+
+
+def _can_pass_through(ctx: AppContext, request: ArchiveRequest) -> bool:
+    # 只有不需要加水印、且无需保留本地副本的文件才能直传
+    return (
+        ctx.settings.archive_pass_through_enabled
+        and ctx.r2_service().enabled
+        and not ctx.settings.archive_keep_local_copy
+        and request.origin_url.startswith(("http://", "https://"))
+        and not ctx.file_processor_service().will_modify(request.source_name, request.size)
+    )
+
+
+async def _stage_pass_through(ctx: AppContext, request: ArchiveRequest) -> StagedArchive:
+    """下载流直接分片上传到 R2，同时计算 md5，全程不落盘。"""
+    result = await ctx.r2_service().upload_stream(stream_download(request.origin_url), request.source_name)
+    uploaded_key = result.key if result.created else ""
+    try:
+        if request.size > 0 and result.size != request.size:
+            raise RuntimeError(f"size mismatch: expected={request.size} actual={result.size}")
+        uniq_candidates = unique_candidates(
+            [result.md5, *to_long_candidates(bytes.fromhex(result.md5)), *request.segment_md5_candidates]
+        )
+        duplicated = await ctx.archive_service().get_by_md5_candidates(uniq_candidates)
+    except Exception:
+        if uploaded_key:
+            try:
+                await ctx.r2_service().delete(uploaded_key)
+            except Exception:
+                LOGGER.exception("rollback r2 object failed: key=%s", uploaded_key)
+        raise
+    return StagedArchive(
+        request = request,
+        archive_url = result.url,
+        size = result.size,
+        md5 = result.md5,
+        enabled = 1 if duplicated else 0,
+        uploaded_key = uploaded_key,
+    )
+
+
+async def _stage_archive(ctx: AppContext, request: ArchiveRequest, fetch: FetchFile) -> StagedArchive:
+    if _can_pass_through(ctx, request):
+        try:
+            return await _stage_pass_through(ctx, request)
+        except Exception:
+            LOGGER.warning(
+                "pass-through upload failed, fallback to local download: file=%s",
+                request.source_name,
+                exc_info = True,
+            )
+
+    source_name = request.source_name
+    cache = ctx.archive_cache_service()
+    uploaded_key = ""
+    local_file: Path | None = None
+    temporary_files: list[Path] = []
+    try:
+        cache_key = flight_key(request)
+        local_file = await cache.lookup(cache_key)
+        if local_file is not None:
+            LOGGER.info("reuse cached download: file=%s path=%s", source_name, local_file)
+        else:
+            download_name = f"{time.time_ns()}-{source_name}"
+            # 分片目录按 flight_key 固定，重试时能在同一 .partial 目录下找到上次的断点
+            local_path = await fetch(await cache.shard_dir(cache_key or download_name), download_name)
+            local_file = Path(local_path)
+        file_size = local_file.stat().st_size
+
+        md5, md5_bytes = await asyncio.to_thread(file_md5, local_file)
+        uniq_candidates = unique_candidates(
+            [md5, *to_long_candidates(md5_bytes), *request.segment_md5_candidates]
+        )
+
+        duplicated = await ctx.archive_service().get_by_md5_candidates(uniq_candidates)
+        enabled = 1 if duplicated else 0
+
+        # 内容寻址模式下先 HEAD：对象已存在时直接复用，跳过水印与上传
+        existing_key = ctx.r2_service().content_key(source_name, md5)
+        if existing_key and not await ctx.r2_service().exists(existing_key):
+            existing_key = ""
+
+        local_store = ctx.local_store_service()
+        local_archive_path: Path | None = None
+        if existing_key:
+            archive_url = ctx.r2_service().object_url(existing_key)
+            LOGGER.info("r2 object already exists, skip upload: key=%s", existing_key)
+        elif not ctx.r2_service().enabled and local_store.has_blob(md5):
+            # 本地存储已有相同内容：只为新文件名建立硬链接，跳过水印
+            stored_path, created = await local_store.link(source_name, md5)
+            archive_url = str(stored_path)
+            if created:
+                local_archive_path = stored_path
+            LOGGER.info("local blob already exists, skip store: path=%s", stored_path)
+        else:
+            processed = await ctx.file_processor_service().prepare_for_archive(local_file)
+            archive_input = processed.archive_source
+            temporary_files = processed.temp_files
+
+            archive_url = str(archive_input)
+            if ctx.r2_service().enabled:
+                uploaded_key, remote_url = await ctx.r2_service().upload(
+                    str(archive_input),
+                    object_name = source_name,
+                    content_hash = md5,
+                )
+                archive_url = remote_url
+            else:
+                # 无 R2 时，归档落地文件名也必须保持源文件名，避免暴露临时前缀和 .wm 后缀。
+                stored_path, created = await local_store.put(archive_input, source_name, md5)
+                archive_url = str(stored_path)
+                if created:
+                    local_archive_path = stored_path
+
+        return StagedArchive(
+            request = request,
+            archive_url = archive_url,
+            size = file_size,
+            md5 = md5,
+            enabled = enabled,
+            uploaded_key = uploaded_key,
+            local_archive_path = local_archive_path,
+        )
+    except Exception:
+        if uploaded_key:
+            try:
+                await ctx.r2_service().delete(uploaded_key)
+            except Exception:
+                LOGGER.exception("rollback r2 object failed: key=%s", uploaded_key)
+        raise
+    finally:
+        for tmp_path in temporary_files:
+            try:
+                tmp_path.unlink(missing_ok = True)
+            except Exception:
+                LOGGER.debug("remove temporary watermark file failed: %s", tmp_path)
+
+        if (
+            local_file is not None
+            and ctx.r2_service().enabled
+            and not ctx.settings.archive_keep_local_copy
+        ):
+            try:
+                local_file.unlink(missing_ok = True)
+            except Exception:
+                LOGGER.debug("remove local tmp failed: %s", local_file)
+        elif local_file is not None:
+            # 保留的本地副本纳入缓存预算，超出时淘汰最久未用的文件
+            await cache.admit(local_file, cache_key)
+
+
+def _archive_row(staged: StagedArchive) -> dict:
+    return {
+        "file_name": staged.request.source_name,
+        "archive_url": staged.archive_url,
+        "sender_id": staged.request.sender_id,
+        "size": staged.size,
+        "md5": staged.md5,
+        "origin_url": staged.request.origin_url,
+        "enabled": staged.enabled,
+    }
+
+
+async def commit_archives(
+    ctx: AppContext,
+    staged_items: list[StagedArchive],
+) -> tuple[list[ArchivedFile], list[StagedArchive]]:
+    """批量入库并写入 Meili 索引；返回 (成功记录, 已回滚的失败项)。"""
+    if not staged_items:
+        return [], []
+
+    # 同一批次内的重复文件：首个保持可检索，其余标记为重复
+    seen_md5: set[str] = set()
+    for staged in staged_items:
+        if staged.md5 in seen_md5:
+            staged.enabled = 1
+        seen_md5.add(staged.md5)
+
+    saved: list[ArchivedFile] = []
+    failed: list[StagedArchive] = []
+    try:
+        saved = await ctx.archive_service().save_archives([_archive_row(item) for item in staged_items])
+    except Exception:
+        LOGGER.exception("batch save archives failed, fallback to per-file save: count=%s", len(staged_items))
+        # 批量失败时逐条重试，单个文件失败只回滚它自己
+        for staged in staged_items:
+            try:
+                saved.append(await ctx.archive_service().save_archive(**_archive_row(staged)))
+            except Exception:
+                LOGGER.exception("save archive failed: name=%s", staged.request.source_name)
+                await staged.rollback(ctx)
+                failed.append(staged)
+
+    await ctx.meilisearch_service().index_archived_files(saved)
+    for item in saved:
+        try:
+            await ctx.query_log_service().close_pending_by_archive(
+                archive_name = item.name,
+                archive_url = item.archive_url,
+            )
+        except Exception:
+            LOGGER.exception("close pending query log failed for archive_id=%s", item.id)
+    return saved, failed
+
+
+async def archive_file(
+    ctx: AppContext,
+    request: ArchiveRequest,
+    fetch: FetchFile,
+    slot: AsyncContextManager | None = None,
+) -> ArchivedFile:
+    """单文件完整归档；任一步骤失败都会回滚并抛出异常。"""
+    staged = await stage_archive(ctx, request, fetch, slot)
+    saved, _ = await commit_archives(ctx, [staged])
+    if not saved:
+        raise RuntimeError(f"save archive failed: {request.source_name}")
+    return saved[0]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import signal
+
+from plugins.archive.lanes import ArchiveLanes
+from plugins.archive.pipeline import ArchiveRequest, archive_file, url_fetcher
+from plugins.common import AppContext
+from shared.services.archive_queue_service import ArchiveJob
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ArchiveWorker:
+    def __init__(self, ctx: AppContext, consumer: str) -> None:
+        self._ctx = ctx
+        self._queue = ctx.archive_queue_service()
+        self._consumer = consumer
+        self._concurrency = max(1, ctx.settings.archive_worker_concurrency)
+        self._lanes = ArchiveLanes(ctx.settings)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def run(self, stop: asyncio.Event) -> None:
+        await self._queue.ensure_group()
+        try:
+            await self._ctx.archive_cache_service().startup()
+        except Exception:
+            LOGGER.exception("archive cache startup cleanup failed")
+        LOGGER.info("archive worker started: consumer=%s concurrency=%s", self._consumer, self._concurrency)
+        while not stop.is_set():
+            free = self._concurrency - len(self._tasks)
+            if free <= 0:
+                await asyncio.wait(self._tasks, return_when = asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                entries = await self._queue.claim_stale(self._consumer, free)
+                if not entries:
+                    entries = await self._queue.read(self._consumer, free, block_ms = 2000)
+            except Exception:
+                LOGGER.exception("read archive queue failed")
+                await asyncio.sleep(3)
+                continue
+            for entry_id, job in entries:
+                task = asyncio.create_task(self._handle(entry_id, job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            LOGGER.info("archive worker stopping, waiting for %s running jobs", len(self._tasks))
+            await asyncio.gather(*self._tasks, return_exceptions = True)
+        LOGGER.info("archive worker stopped: consumer=%s", self._consumer)
+
+    async def _heartbeat(self, entry_id: str) -> None:
+        interval = max(1.0, self._queue.claim_idle_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._queue.heartbeat(self._consumer, entry_id)
+            except Exception:
+                LOGGER.debug("archive job heartbeat failed: entry=%s", entry_id)
+
+    async def _handle(self, entry_id: str, job: ArchiveJob) -> None:
+        request = ArchiveRequest(
+            source_name = job.name,
+            sender_id = job.sender_id,
+            group_id = job.group_id,
+            message_id = job.message_id,
+            origin_url = job.url,
+            segment_md5_candidates = job.md5_candidates,
+            size = job.size,
+        )
+
+        heartbeat = asyncio.create_task(self._heartbeat(entry_id))
+        try:
+            saved = await archive_file(
+                self._ctx,
+                request,
+                url_fetcher(self._ctx, request),
+                self._lanes.slot(job.name, job.size),
+            )
+        except Exception as exc:
+            LOGGER.exception("archive job failed: entry=%s name=%s attempts=%s", entry_id, job.name, job.attempts)
+            # 简单退避后再重新入队，避免瞬时故障下反复失败
+            await asyncio.sleep(min(60, 5 * (job.attempts + 1)))
+            try:
+                await self._queue.retry_or_dead_letter(entry_id, job, f"{type(exc).__name__}: {exc}")
+            except Exception:
+                # 未 ACK 的任务会在空闲超时后被重新认领
+                LOGGER.exception("requeue archive job failed: entry=%s", entry_id)
+            return
+        finally:
+            heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await heartbeat
+
+        try:
+            await self._queue.ack(entry_id)
+        except Exception:
+            LOGGER.exception("ack archive job failed: entry=%s", entry_id)
+        LOGGER.info(
+            "archive job completed: entry=%s group_id=%s message_id=%s file=%s",
+            entry_id,
+            job.group_id,
+            job.message_id,
+            saved.name,
+        )
+
+
+async def run_archive_worker(ctx: AppContext, consumer: str) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        await ArchiveWorker(ctx, consumer).run(stop)
+    finally:
+        await ctx.r2_service().aclose()
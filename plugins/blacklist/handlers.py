@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
 
 from ncatbot.core import BotClient
-from ncatbot.core.event import GroupMessageEvent, RequestEvent
+from ncatbot.core.event import GroupMessageEvent, MetaEvent, RequestEvent
 
 from plugins.common import AppContext
+from shared.services.admin_digest_service import KIND_BLACKLIST, KIND_JOIN_BLOCKED
 
 LOGGER = logging.getLogger(__name__)
 QQ_PATTERN = re.compile(r"([0-9]{5,})")
@@ -43,26 +45,38 @@ def _parse_blacklist_content(command: str, text: str) -> tuple[str, str] | None:
     return target_id, remark
 
 
-async def _notify_admin_groups(bot: BotClient, admin_groups: list[str], message: str) -> None:
-    for group_id in admin_groups:
-        try:
-            await bot.api.post_group_msg(group_id=group_id, text=message)
-        except Exception:
-            LOGGER.exception("notify admin group failed: group_id=%s", group_id)
+async def _kick_from_groups(bot: BotClient, ctx: AppContext, groups: list[str], target_id: str) -> dict[str, str]:
+    """并发踢出目标，实际调用由出站队列限速。返回 group_id -> 结果。
 
+    群成员镜像可能滞后（漏掉入群事件或快照未过期），只用来排序与解释失败，不据此跳过任何群。
+    """
+    roster = ctx.group_roster_service()
+    unique_groups = list(dict.fromkeys(str(gid) for gid in groups))
+    presence = await asyncio.gather(*(roster.contains(bot, gid, target_id) for gid in unique_groups))
+    listed = dict(zip(unique_groups, presence))
 
-async def _kick_from_groups(bot: BotClient, groups: list[str], target_id: str) -> None:
-    for group_id in groups:
+    async def _kick(group_id: str) -> str:
         try:
-            await bot.api.set_group_kick(
-                group_id=group_id,
-                user_id=target_id,
+            await ctx.outbound_queue_service().set_group_kick(
+                bot,
+                group_id,
+                target_id,
                 reject_add_request=True,
             )
-            LOGGER.info("kick user from group success: %s -> %s", target_id, group_id)
-        except Exception:
-            # 跨群踢人会经常遇到“不在群”或权限不足，这里只记录不打断流程
+        except Exception as exc:
+            # 常见“不在群”或权限不足，这里只记录不打断流程
             LOGGER.debug("skip kick in group: group_id=%s, user_id=%s", group_id, target_id)
+            if listed[group_id] is False:
+                return "不在群"
+            return f"失败（{str(exc).strip()[:50] or type(exc).__name__}）"
+        roster.discard(group_id, target_id)
+        LOGGER.info("kick user from group success: %s -> %s", target_id, group_id)
+        return "已踢出"
+
+    # 名单显示在群的先入队，尽快踢出
+    ordered = sorted(unique_groups, key = lambda gid: listed[gid] is False)
+    results = dict(zip(ordered, await asyncio.gather(*(_kick(gid) for gid in ordered))))
+    return {gid: results[gid] for gid in unique_groups}
 
 
 def register_blacklist_handlers(bot: BotClient, ctx: AppContext) -> None:
@@ -100,15 +114,24 @@ def register_blacklist_handlers(bot: BotClient, ctx: AppContext) -> None:
             await event.reply(text="该 QQ 已在黑名单中。", at=False)
             return
 
-        await _kick_from_groups(bot, ctx.settings.all_groups, target_id)
+        kick_results = await _kick_from_groups(bot, ctx, ctx.settings.all_groups, target_id)
+        kick_lines = [f"{gid}：{result}" for gid, result in kick_results.items() if result != "不在群"]
+        skipped = sum(1 for result in kick_results.values() if result == "不在群")
+        if skipped:
+            kick_lines.append(f"其余 {skipped} 个群不在群内")
         notify_text = (
             f"已拉黑：{target_id}\n"
             f"昵称：{target_nick or '未知'}\n"
             f"原因：{remark}\n"
             f"操作人：{operator_name}"
         )
-        await _notify_admin_groups(bot, ctx.settings.group_admin, notify_text)
-        await event.reply(text=f"已拉黑 {target_id}", at=False)
+        if kick_lines:
+            notify_text += "\n踢出结果：\n" + "\n".join(kick_lines)
+        await ctx.admin_digest_service().notify(bot, KIND_BLACKLIST, notify_text)
+        reply_text = f"已拉黑 {target_id}"
+        if kick_lines:
+            reply_text += "\n" + "\n".join(kick_lines)
+        await event.reply(text=reply_text, at=False)
 
     @bot.on_request(filter="group")
     async def on_group_join_request(event: RequestEvent) -> None:
@@ -117,8 +140,7 @@ def register_blacklist_handlers(bot: BotClient, ctx: AppContext) -> None:
         if not event.user_id:
             return
 
-        black_item = await ctx.blacklist_service().get_by_qq(event.user_id)
-        if black_item is None:
+        if not await ctx.blacklist_service().contains(event.user_id):
             return
 
         await event.approve(
@@ -131,6 +153,16 @@ def register_blacklist_handlers(bot: BotClient, ctx: AppContext) -> None:
             f"申请群：{event.group_id}\n"
             f"验证信息：{event.comment or '无'}"
         )
-        await _notify_admin_groups(bot, ctx.settings.group_admin, notify_text)
+        await ctx.admin_digest_service().notify(bot, KIND_JOIN_BLOCKED, notify_text)
         LOGGER.info("blocked join request: user_id=%s group_id=%s", event.user_id, event.group_id)
 
+    @bot.on_startup()
+    async def on_blacklist_startup(event: MetaEvent) -> None:
+        try:
+            await ctx.blacklist_service().start_sync()
+        except Exception:
+            LOGGER.exception("load blacklist cache failed, will load on first join request")
+
+    @bot.on_shutdown()
+    async def on_blacklist_shutdown(event: MetaEvent) -> None:
+        await ctx.blacklist_service().stop_sync()
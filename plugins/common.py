@@ -1,16 +1,27 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
 
+from ncatbot.core.event import GroupMessageEvent
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from shared.config import Settings
+from shared.services.admin_digest_service import AdminDigestService
 from shared.services.alist_service import AlistService
+from shared.services.archive_cache_service import ArchiveCacheService
+from shared.services.archive_flight_service import ArchiveFlightService
+from shared.services.archive_queue_service import ArchiveQueueService
 from shared.services.archive_service import ArchiveService
 from shared.services.blacklist_service import BlackListService
 from shared.services.file_processor_service import FileProcessorService
+from shared.services.group_roster_service import GroupRosterService
+from shared.services.local_store_service import LocalStoreService
 from shared.services.meilisearch_service import MeiliSearchService
 from shared.services.nonsense_service import NonsenseService
+from shared.services.outbound_queue_service import OutboundQueueService
+from shared.services.outbox_service import OutboxService
+from shared.services.profile_resolver import ProfileResolver
 from shared.services.q_member_service import QMemberService
 from shared.services.qq_info_service import QQInfoService
 from shared.services.qq_monitor_service import QQMonitorService
@@ -18,29 +29,53 @@ from shared.services.query_log_service import QueryLogService
 from shared.services.r2_service import R2Service
 from shared.services.short_url_service import ShortUrlService
 
+AdminCommand = Callable[[GroupMessageEvent], Awaitable[None]]
+
 
 @dataclass
 class AppContext:
     settings: Settings
     session_factory: async_sessionmaker[AsyncSession]
+    _admin_digest_service: AdminDigestService | None = None
     _alist_service: AlistService | None = None
     _blacklist_service: BlackListService | None = None
     _archive_service: ArchiveService | None = None
+    _archive_queue_service: ArchiveQueueService | None = None
+    _archive_flight_service: ArchiveFlightService | None = None
+    _archive_cache_service: ArchiveCacheService | None = None
     _file_processor_service: FileProcessorService | None = None
+    _group_roster_service: GroupRosterService | None = None
     _query_log_service: QueryLogService | None = None
     _nonsense_service: NonsenseService | None = None
+    _outbound_queue_service: OutboundQueueService | None = None
+    _outbox_service: OutboxService | None = None
+    _profile_resolver: ProfileResolver | None = None
     _q_member_service: QMemberService | None = None
     _qq_info_service: QQInfoService | None = None
     _qq_monitor_service: QQMonitorService | None = None
+    _local_store_service: LocalStoreService | None = None
     _meilisearch_service: MeiliSearchService | None = None
     _r2_service: R2Service | None = None
     _short_url_service: ShortUrlService | None = None
+    # 其他插件提供的管理命令，由 group_admin 统一鉴权与分发
+    _admin_commands: dict[str, AdminCommand] = field(default_factory = dict)
+
+    def register_admin_command(self, name: str, handler: AdminCommand) -> None:
+        self._admin_commands[name] = handler
+
+    def admin_command(self, name: str) -> AdminCommand | None:
+        return self._admin_commands.get(name)
 
     def blacklist_service(self) -> BlackListService:
         if self._blacklist_service is None:
-            self._blacklist_service = BlackListService(self.session_factory)
+            self._blacklist_service = BlackListService(self.session_factory, self.settings)
         return self._blacklist_service
 
+    def admin_digest_service(self) -> AdminDigestService:
+        if self._admin_digest_service is None:
+            self._admin_digest_service = AdminDigestService(self.settings, self.outbound_queue_service())
+        return self._admin_digest_service
+
     def alist_service(self) -> AlistService:
         if self._alist_service is None:
             self._alist_service = AlistService(self.settings)
@@ -51,6 +86,21 @@ class AppContext:
             self._archive_service = ArchiveService(self.session_factory)
         return self._archive_service
 
+    def archive_queue_service(self) -> ArchiveQueueService:
+        if self._archive_queue_service is None:
+            self._archive_queue_service = ArchiveQueueService(self.settings)
+        return self._archive_queue_service
+
+    def archive_flight_service(self) -> ArchiveFlightService:
+        if self._archive_flight_service is None:
+            self._archive_flight_service = ArchiveFlightService(self.settings)
+        return self._archive_flight_service
+
+    def archive_cache_service(self) -> ArchiveCacheService:
+        if self._archive_cache_service is None:
+            self._archive_cache_service = ArchiveCacheService(self.settings)
+        return self._archive_cache_service
+
     def query_log_service(self) -> QueryLogService:
         if self._query_log_service is None:
             self._query_log_service = QueryLogService(self.session_factory)
@@ -61,6 +111,25 @@ class AppContext:
             self._nonsense_service = NonsenseService(self.session_factory, self.settings)
         return self._nonsense_service
 
+    def outbound_queue_service(self) -> OutboundQueueService:
+        if self._outbound_queue_service is None:
+            self._outbound_queue_service = OutboundQueueService(self.settings)
+        return self._outbound_queue_service
+
+    def outbox_service(self) -> OutboxService:
+        if self._outbox_service is None:
+            self._outbox_service = OutboxService(self.settings)
+        return self._outbox_service
+
+    def profile_resolver(self) -> ProfileResolver:
+        if self._profile_resolver is None:
+            self._profile_resolver = ProfileResolver(
+                self.settings,
+                self.group_roster_service(),
+                self.qq_info_service(),
+            )
+        return self._profile_resolver
+
     def q_member_service(self) -> QMemberService:
         if self._q_member_service is None:
             self._q_member_service = QMemberService(self.session_factory)
@@ -81,6 +150,16 @@ class AppContext:
             self._file_processor_service = FileProcessorService(self.settings)
         return self._file_processor_service
 
+    def group_roster_service(self) -> GroupRosterService:
+        if self._group_roster_service is None:
+            self._group_roster_service = GroupRosterService(self.settings)
+        return self._group_roster_service
+
+    def local_store_service(self) -> LocalStoreService:
+        if self._local_store_service is None:
+            self._local_store_service = LocalStoreService(self.settings)
+        return self._local_store_service
+
     def meilisearch_service(self) -> MeiliSearchService:
         if self._meilisearch_service is None:
             self._meilisearch_service = MeiliSearchService(self.settings)
@@ -6,10 +6,12 @@ import re
 from typing import Any
 
 from ncatbot.core import BotClient
-from ncatbot.core.event import GroupMessageEvent, NoticeEvent
+from ncatbot.core.event import GroupMessageEvent, MetaEvent, NoticeEvent
 
 from plugins.common import AppContext
 from plugins.query.parser import is_qiuwen
+from shared.services.admin_digest_service import KIND_BAN_WORD
+from shared.services.outbound_queue_service import PRIORITY_INTERACTIVE
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,6 +20,7 @@ HELP_TEXT = (
     "可用命令：\n"
     "/help - 查看命令列表\n"
     "/resetAlistPwd - 重置云盘密码\n"
+    "/clearInvalid - 立即执行失效人员清理\n"
     "/拉黑 QQ号 [原因] - 拉黑并全群踢出"
 )
 
@@ -81,7 +84,7 @@ def _normalize_message_id(raw: Any) -> str | None:
 def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
     async def _post_msg_and_set_essence(group_id: str, text: str) -> None:
         try:
-            raw_msg_id = await bot.api.post_group_msg(group_id=group_id, text=text)
+            raw_msg_id = await ctx.outbound_queue_service().post_group_msg(bot, group_id, text)
         except Exception:
             LOGGER.exception("send reset pwd message failed: group_id=%s", group_id)
             return
@@ -98,7 +101,7 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
         retry_delays = (0.6, 1.2, 2.0, 3.0, 5.0)
         for attempt in range(1, len(retry_delays) + 2):
             try:
-                await bot.api.set_essence_msg(message_id=msg_id)
+                await ctx.outbound_queue_service().set_essence_msg(bot, group_id, msg_id)
                 LOGGER.info("set essence msg in command: group_id=%s msg_id=%s", group_id, msg_id)
                 return
             except Exception:
@@ -146,6 +149,11 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
                 await _post_msg_and_set_essence(gid, msg)
             return
 
+        handler = ctx.admin_command(text.split()[0])
+        if handler is not None:
+            await handler(event)
+            return
+
     @bot.on_group_message()
     async def forward_admin_message(event: GroupMessageEvent) -> None:
         if event.group_id not in ctx.settings.group_admin:
@@ -166,7 +174,7 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
             if target == event.group_id:
                 continue
             try:
-                await bot.api.post_group_msg(group_id=target, text=forward_text)
+                await ctx.outbound_queue_service().post_group_msg(bot, target, forward_text)
             except Exception:
                 LOGGER.exception("forward admin message failed: target=%s", target)
 
@@ -202,11 +210,8 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
             f"命中词：{hit}\n"
             f"内容：{re.sub(r'\\s+', ' ', text)[:200]}"
         )
-        for admin_gid in ctx.settings.group_admin:
-            try:
-                await bot.api.post_group_msg(group_id=admin_gid, text=notice)
-            except Exception:
-                LOGGER.exception("notify admin ban-word event failed: %s", admin_gid)
+        # 刷屏时同类通知按窗口合并，避免管理群被刷屏
+        await ctx.admin_digest_service().notify(bot, KIND_BAN_WORD, notice)
 
     @bot.on_notice()
     async def on_member_join_notice(event: NoticeEvent) -> None:
@@ -217,10 +222,12 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
                 if str(event.user_id) == str(event.self_id):
                     return
                 try:
-                    await bot.api.post_group_msg(
-                        group_id=event.group_id,
+                    await ctx.outbound_queue_service().post_group_msg(
+                        bot,
+                        event.group_id,
+                        "欢迎入群，请先阅读群公告并遵守规则。",
                         at=event.user_id,
-                        text="欢迎入群，请先阅读群公告并遵守规则。",
+                        priority=PRIORITY_INTERACTIVE,
                     )
                 except Exception:
                     LOGGER.exception("send welcome failed: group_id=%s user_id=%s", event.group_id, event.user_id)
@@ -230,6 +237,42 @@ def register_group_admin_handlers(bot: BotClient, ctx: AppContext) -> None:
             notify = f"Bot 已加入新群：{event.group_id}（sub_type={event.sub_type}）"
             for admin_group in ctx.settings.group_admin:
                 try:
-                    await bot.api.post_group_msg(group_id=admin_group, text=notify)
+                    await ctx.outbound_queue_service().post_group_msg(bot, admin_group, notify)
                 except Exception:
                     LOGGER.exception("notify bot join group failed: group_id=%s", admin_group)
+
+    @bot.on_notice()
+    async def on_roster_notice(event: NoticeEvent) -> None:
+        # 群成员名单镜像的增量维护
+        if not event.group_id or not event.user_id:
+            return
+        roster = ctx.group_roster_service()
+        if event.notice_type == "group_increase":
+            roster.on_member_join(event.group_id, event.user_id, int(event.time or 0))
+        elif event.notice_type == "group_decrease":
+            roster.discard(event.group_id, event.user_id)
+        elif event.notice_type == "group_card":
+            roster.on_member_update(event.group_id, event.user_id, card = event.card_new or "")
+        elif event.notice_type == "group_admin":
+            role = "admin" if event.sub_type == "set" else "member"
+            roster.on_member_update(event.group_id, event.user_id, role = role)
+
+    @bot.on_group_message()
+    async def on_roster_message(event: GroupMessageEvent) -> None:
+        sender = event.sender
+        ctx.group_roster_service().on_member_update(
+            event.group_id,
+            event.user_id,
+            card = getattr(sender, "card", None),
+            role = getattr(sender, "role", None),
+            nickname = getattr(sender, "nickname", None),
+            last_sent_time = int(event.time or 0),
+        )
+
+    @bot.on_startup()
+    async def on_roster_startup(event: MetaEvent) -> None:
+        await ctx.group_roster_service().bootstrap(bot, ctx.settings.all_groups)
+
+    @bot.on_shutdown()
+    async def on_admin_digest_shutdown(event: MetaEvent) -> None:
+        await ctx.admin_digest_service().flush_all()
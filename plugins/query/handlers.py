@@ -13,6 +13,7 @@ from ncatbot.core.event import GroupMessageEvent
 from plugins.common import AppContext
 from plugins.query.parser import extract_book_info, is_qiuwen
 from plugins.query.rate_limiter import QueryRateLimiter
+from shared.services.admin_digest_service import KIND_QUERY_OVER_LIMIT
 
 LOGGER = logging.getLogger(__name__)
 
@@ -42,13 +43,18 @@ def register_query_handlers(bot: BotClient, ctx: AppContext) -> None:
         if user_id in exempt_user_ids:
             return True
 
+        roster = ctx.group_roster_service()
         for admin_group_id in ctx.settings.group_admin:
-            try:
-                await bot.api.get_group_member_info(admin_group_id, user_id)
-                exempt_user_ids.add(user_id)
+            present = await roster.contains(bot, admin_group_id, user_id)
+            if present is None:
+                # 名单不可用时退回单次查询
+                try:
+                    await bot.api.get_group_member_info(admin_group_id, user_id)
+                    present = True
+                except Exception:
+                    present = False
+            if present:
                 return True
-            except Exception:
-                continue
         return False
 
     async def _search_archived_files(keyword: str, fallback_book_name: str) -> list[dict]:
@@ -123,11 +129,7 @@ def register_query_handlers(bot: BotClient, ctx: AppContext) -> None:
                 f"禁言时长：{mute_minutes}分钟（至次日00:00）\n"
                 f"内容：{re.sub(r'\\s+', ' ', text)[:200]}"
             )
-            for admin_gid in ctx.settings.group_admin:
-                try:
-                    await bot.api.post_group_msg(group_id=admin_gid, text=notice)
-                except Exception:
-                    LOGGER.exception("notify admin over-limit event failed: %s", admin_gid)
+            await ctx.admin_digest_service().notify(bot, KIND_QUERY_OVER_LIMIT, notice)
             return
 
         keyword = f"{book_name} {author}".strip()
@@ -10,16 +10,24 @@ from zoneinfo import ZoneInfo
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from ncatbot.core import BotClient
-from ncatbot.core.event import MetaEvent
+from ncatbot.core.event import GroupMessageEvent, MetaEvent
 
 from plugins.common import AppContext
+from shared.redis_client import get_redis
+from shared.services.outbound_queue_service import PRIORITY_REPORT
+from shared.services.outbox_service import OutboxEntry
 from shared.utils.excel_export import export_invalid_members_excel
 
 LOGGER = logging.getLogger(__name__)
 
+_QQ_INFO_CHECKPOINT_KEY = "qq_info:refresh:done"
+_QQ_INFO_CHECKPOINT_TTL = 2 * 24 * 3600
+
 
 def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
     scheduler: AsyncIOScheduler | None = None
+    clear_invalid_lock = asyncio.Lock()
+    background_tasks: set[asyncio.Task] = set()
     scheduler_tz = dt_timezone(timedelta(hours = 8))
 
     def _normalize_message_id(raw: Any) -> str | None:
@@ -49,12 +57,88 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             return _normalize_message_id(msg_id)
         return None
 
-    async def _notify_groups(groups: list[str], text: str) -> None:
+    async def _set_essence_with_retry(group_id: str, message_id: str) -> bool:
+        # NapCat 需要整数 message_id；字符串型 ID 有时会被拒绝
+        try:
+            essence_msg_id: Any = int(message_id)
+        except (ValueError, TypeError):
+            essence_msg_id = message_id
+
+        # NapCat 发送后需要短暂时间完成消息索引，立即调用会概率性失败
+        # 首次调用前先等待 1.5s，失败时再按退避策略重试
+        await asyncio.sleep(1.5)
+        retry_delays = (1.0, 2.0, 4.0, 6.0)
+        for attempt in range(1, len(retry_delays) + 2):
+            try:
+                await ctx.outbound_queue_service().set_essence_msg(
+                    bot,
+                    group_id,
+                    essence_msg_id,
+                    priority = PRIORITY_REPORT,
+                )
+                LOGGER.info("set essence msg: group_id=%s, msg_id=%s", group_id, essence_msg_id)
+                return True
+            except Exception:
+                if attempt > len(retry_delays):
+                    LOGGER.exception(
+                        "set essence msg failed after retries: group_id=%s, msg_id=%s",
+                        group_id,
+                        essence_msg_id,
+                    )
+                    return False
+                delay = retry_delays[attempt - 1]
+                LOGGER.warning(
+                    "set essence msg attempt %d failed, retry in %.1fs: group_id=%s msg_id=%s",
+                    attempt, delay, group_id, essence_msg_id,
+                )
+                await asyncio.sleep(delay)
+        return False
+
+    async def _set_essence(group_id: str, raw_msg_id: Any) -> None:
+        msg_id = _normalize_message_id(raw_msg_id)
+        if msg_id is None:
+            LOGGER.warning(
+                "set essence skipped: invalid message_id, group_id=%s raw=%r",
+                group_id,
+                raw_msg_id,
+            )
+            return
+
+        essence_ok = await _set_essence_with_retry(group_id, msg_id)
+
+        if not essence_ok:
+            LOGGER.warning(
+                "set essence still failed after retries: group_id=%s msg_id=%s",
+                group_id,
+                msg_id,
+            )
+
+    async def _report_failure(
+        scene: str,
+        gid: str,
+        text: str,
+        exc: Exception,
+        *,
+        kind: str,
+        collapse: bool,
+        essence: bool = False,
+    ) -> None:
+        is_outage = await ctx.qq_monitor_service().report_send_exception(
+            bot,
+            scene = scene,
+            target_group = str(gid),
+            error = exc,
+        )
+        # 仅连接类故障写入 outbox，恢复后补发；kind 为空表示无需补发
+        if is_outage and kind:
+            await ctx.outbox_service().enqueue(gid, text, kind = kind, collapse = collapse, essence = essence)
+
+    async def _notify_groups(groups: list[str], text: str, *, kind: str = "notice", collapse: bool = False) -> None:
         if not groups:
             return
         for gid in groups:
             try:
-                await bot.api.post_group_msg(group_id = gid, text = text)
+                await ctx.outbound_queue_service().post_group_msg(bot, gid, text, priority = PRIORITY_REPORT)
                 if gid in ctx.settings.qq_monitor_alarm_groups:
                     await ctx.qq_monitor_service().report_recovery(
                         bot,
@@ -63,83 +147,66 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
                     )
             except Exception as exc:
                 LOGGER.exception("send scheduler message failed: group_id=%s", gid)
-                await ctx.qq_monitor_service().report_send_exception(
-                    bot,
-                    scene = "scheduler_notify",
-                    target_group = str(gid),
-                    error = exc,
-                )
-
-    async def _notify_groups_and_set_essence(groups: list[str], text: str) -> None:
+                await _report_failure("scheduler_notify", gid, text, exc, kind = kind, collapse = collapse)
+
+    async def _notify_groups_and_set_essence(
+        groups: list[str],
+        text: str,
+        *,
+        kind: str = "notice",
+        collapse: bool = False,
+    ) -> None:
         """发送消息到群并设置为群精华"""
         if not groups:
             return
 
-        async def _set_essence_with_retry(group_id: str, message_id: str) -> bool:
-            # NapCat 需要整数 message_id；字符串型 ID 有时会被拒绝
-            try:
-                essence_msg_id: Any = int(message_id)
-            except (ValueError, TypeError):
-                essence_msg_id = message_id
-
-            # NapCat 发送后需要短暂时间完成消息索引，立即调用会概率性失败
-            # 首次调用前先等待 1.5s，失败时再按退避策略重试
-            await asyncio.sleep(1.5)
-            retry_delays = (1.0, 2.0, 4.0, 6.0)
-            for attempt in range(1, len(retry_delays) + 2):
-                try:
-                    await bot.api.set_essence_msg(message_id = essence_msg_id)
-                    LOGGER.info("set essence msg: group_id=%s, msg_id=%s", group_id, essence_msg_id)
-                    return True
-                except Exception:
-                    if attempt > len(retry_delays):
-                        LOGGER.exception(
-                            "set essence msg failed after retries: group_id=%s, msg_id=%s",
-                            group_id,
-                            essence_msg_id,
-                        )
-                        return False
-                    delay = retry_delays[attempt - 1]
-                    LOGGER.warning(
-                        "set essence msg attempt %d failed, retry in %.1fs: group_id=%s msg_id=%s",
-                        attempt, delay, group_id, essence_msg_id,
-                    )
-                    await asyncio.sleep(delay)
-            return False
-
         for gid in groups:
             try:
-                raw_msg_id = await bot.api.post_group_msg(group_id = gid, text = text)
+                raw_msg_id = await ctx.outbound_queue_service().post_group_msg(bot, gid, text, priority = PRIORITY_REPORT)
             except Exception as exc:
                 LOGGER.exception("send scheduler message failed before set_essence: group_id=%s", gid)
-                await ctx.qq_monitor_service().report_send_exception(
-                    bot,
-                    scene = "scheduler_notify_set_essence",
-                    target_group = str(gid),
-                    error = exc,
-                )
-                continue
-
-            msg_id = _normalize_message_id(raw_msg_id)
-            if msg_id is None:
-                LOGGER.warning(
-                    "set essence skipped: invalid message_id, group_id=%s raw=%r",
+                await _report_failure(
+                    "scheduler_notify_set_essence",
                     gid,
-                    raw_msg_id,
+                    text,
+                    exc,
+                    kind = kind,
+                    collapse = collapse,
+                    essence = True,
                 )
                 continue
 
-            essence_ok = await _set_essence_with_retry(gid, msg_id)
+            await _set_essence(gid, raw_msg_id)
 
-            if not essence_ok:
-                LOGGER.warning(
-                    "set essence still failed after retries: group_id=%s msg_id=%s",
-                    gid,
-                    msg_id,
-                )
+    async def _deliver_outbox_entry(entry: OutboxEntry) -> None:
+        try:
+            raw_msg_id = await ctx.outbound_queue_service().post_group_msg(
+                bot,
+                entry.group_id,
+                entry.text,
+                priority = PRIORITY_REPORT,
+            )
+        except Exception as exc:
+            # 连接类失败说明仍在故障中：重新记录故障并停止本轮，下次恢复时再次补发
+            is_outage = await ctx.qq_monitor_service().report_send_exception(
+                bot,
+                scene = "outbox_drain",
+                target_group = entry.group_id,
+                error = exc,
+            )
+            if is_outage:
+                raise
+            # 其他失败（群已解散、被禁言、内容被拒等）重试也不会成功：丢弃该条，继续补发后面的消息
+            LOGGER.warning("outbox entry dropped after permanent failure: id=%s error=%s", entry.id, exc)
+            return
+        if entry.essence:
+            await _set_essence(entry.group_id, raw_msg_id)
 
-    async def _notify_admin_groups(text: str) -> None:
-        await _notify_groups(ctx.settings.group_admin, text)
+    async def _drain_outbox() -> None:
+        await ctx.outbox_service().drain(_deliver_outbox_entry)
+
+    async def _notify_admin_groups(text: str, *, kind: str = "notice", collapse: bool = False) -> None:
+        await _notify_groups(ctx.settings.group_admin, text, kind = kind, collapse = collapse)
 
     async def _search_hits(keyword: str) -> list[dict]:
         hits = await ctx.meilisearch_service().search(keyword, limit = 5)
@@ -155,36 +222,35 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             for row in rows
         ]
 
-    async def _get_group_name(group_id: str) -> str:
-        try:
-            info = await bot.api.get_group_info(group_id)
-            return str(info.group_name)
-        except Exception:
-            return str(group_id)
+    async def _get_group_names(group_ids: list[str]) -> dict[str, str]:
+        return await ctx.group_roster_service().group_names(bot, group_ids)
 
     async def _get_group_members(group_ids: list[str]) -> tuple[list[dict], dict[str, str]]:
         members: list[dict] = []
-        group_names: dict[str, str] = {}
-        for gid in group_ids:
-            group_names[gid] = await _get_group_name(gid)
-            try:
-                member_list = await bot.api.get_group_member_list(gid)
-                for m in member_list.members:
-                    members.append(
-                        {
-                            "group_id": str(gid),
-                            "group_name": group_names[gid],
-                            "user_id": str(m.user_id),
-                            "nickname": m.nickname,
-                            "card": m.card or "",
-                            "title": m.title or "",
-                            "join_time": m.join_time,
-                            "last_sent_time": m.last_sent_time,
-                            "role": m.role,
-                        }
-                    )
-            except Exception:
-                LOGGER.exception("get group members failed: %s", gid)
+        roster_service = ctx.group_roster_service()
+        # 各群名单并发加载，实际拉取数受 GROUP_ROSTER_FETCH_CONCURRENCY 限制
+        group_names, rosters = await asyncio.gather(
+            _get_group_names(group_ids),
+            asyncio.gather(*(roster_service.members(bot, gid) for gid in group_ids)),
+        )
+        for gid, roster in zip(group_ids, rosters):
+            if roster is None:
+                LOGGER.error("get group members failed: %s", gid)
+                continue
+            for m in roster:
+                members.append(
+                    {
+                        "group_id": str(gid),
+                        "group_name": group_names[gid],
+                        "user_id": str(m.user_id),
+                        "nickname": m.nickname,
+                        "card": m.card or "",
+                        "title": m.title or "",
+                        "join_time": m.join_time,
+                        "last_sent_time": m.last_sent_time,
+                        "role": m.role,
+                    }
+                )
         return members, group_names
 
     async def daily_report_job() -> None:
@@ -202,7 +268,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             f"昨日求文：{query_count}\n"
             f"当前未完成求文：{unfinished}"
         )
-        await _notify_admin_groups(text)
+        await _notify_admin_groups(text, kind = "daily_report", collapse = True)
 
     async def monthly_report_job() -> None:
         now = datetime.now()
@@ -221,7 +287,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
         else:
             for idx, (sender_id, cnt) in enumerate(top, start = 1):
                 lines.append(f"{idx}. {sender_id} - {cnt}份")
-        await _notify_admin_groups("\n".join(lines))
+        await _notify_admin_groups("\n".join(lines), kind = "monthly_report", collapse = True)
 
     async def weekly_report_job() -> None:
         now = datetime.now()
@@ -244,7 +310,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
                     lines.append(f"{idx}. {sender_id} - {cnt}份 ({ratio:.2f}%)")
                 else:
                     lines.append(f"{idx}. {sender_id} - {cnt}份")
-        await _notify_admin_groups("\n".join(lines))
+        await _notify_admin_groups("\n".join(lines), kind = "weekly_report", collapse = True)
 
     async def query_polling_job() -> None:
         rows = await ctx.query_log_service().list_unfinished(limit = 300)
@@ -284,7 +350,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             lines.append(
                 f"- #{row.id} {row.extract or row.content[:20]} | 用户:{row.sender_id} | 时间:{row.send_time:%m-%d %H:%M}"
             )
-        await _notify_admin_groups("\n".join(lines))
+        await _notify_admin_groups("\n".join(lines), kind = "query_feedback", collapse = True)
 
     async def hot_query_rank_job() -> None:
         now = datetime.now()
@@ -295,7 +361,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
         lines = ["【热门求文排行（近7天）】"]
         for idx, (name, cnt) in enumerate(rank, start = 1):
             lines.append(f"{idx}. {name} - {cnt}次")
-        await _notify_admin_groups("\n".join(lines))
+        await _notify_admin_groups("\n".join(lines), kind = "hot_query_rank", collapse = True)
 
     async def reset_password_job() -> None:
         if not ctx.alist_service().enabled:
@@ -313,7 +379,7 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             return
 
         msg = f"资源云盘密码已重置为：{password}"
-        await _notify_groups_and_set_essence(ctx.settings.group_res, msg)
+        await _notify_groups_and_set_essence(ctx.settings.group_res, msg, kind = "password", collapse = True)
 
     async def send_nonsense_job() -> None:
         if not ctx.settings.group_chat:
@@ -325,73 +391,136 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
             return
 
         text = f"{content}"
-        await _notify_groups(ctx.settings.group_chat, text)
+        await _notify_groups(ctx.settings.group_chat, text, kind = "")
 
     async def refresh_qq_info_job() -> None:
-        members = await ctx.q_member_service().list_all()
-        exists = {str(m.qq): m for m in members}
-        merged: list[tuple[str, str, str]] = []
+        stale_before = datetime.now() - timedelta(days = ctx.settings.qq_info_refresh_max_age_days)
+        known_ids = await ctx.q_member_service().list_qq_ids()
+        sender_ids = await ctx.archive_service().list_distinct_sender_ids()
 
-        for qq in exists.keys():
-            info = await ctx.qq_info_service().get_info(qq)
-            if info is None:
-                continue
-            merged.append((qq, info[0], info[1]))
+        # 新出现的分享者优先，其次资料缺失与最久未刷新的成员
+        candidates = [qq for qq in dict.fromkeys(str(q) for q in sender_ids) if qq not in known_ids]
+        candidates += await ctx.q_member_service().list_stale(stale_before)
 
-        sender_ids = await ctx.archive_service().list_distinct_sender_ids()
-        for qq in sender_ids:
-            key = str(qq)
-            if key in exists:
-                continue
-            info = await ctx.qq_info_service().get_info(key)
-            if info is None:
-                continue
-            merged.append((key, info[0], info[1]))
+        # 断点只是优化：Redis 不可用时本轮不续传也不记录断点，刷新照常进行
+        redis = None
+        done_ids: set[str] = set()
+        try:
+            redis = await get_redis()
+            done_ids = await redis.smembers(_QQ_INFO_CHECKPOINT_KEY)
+        except Exception:
+            LOGGER.warning("qq info checkpoint unavailable, refresh without it", exc_info = True)
+            redis = None
+        if done_ids:
+            LOGGER.info("qq info refresh resumed: skip=%s", len(done_ids))
+        candidates = [qq for qq in dict.fromkeys(candidates) if qq not in done_ids]
+
+        async def _clear_checkpoint() -> None:
+            if redis is None:
+                return
+            try:
+                await redis.delete(_QQ_INFO_CHECKPOINT_KEY)
+            except Exception:
+                LOGGER.warning("clear qq info checkpoint failed")
+
+        if not candidates:
+            await _clear_checkpoint()
+            return
 
-        updated, created = await ctx.q_member_service().upsert_many(merged)
-        if updated or created:
-            LOGGER.info("qq info refreshed: updated=%s created=%s", updated, created)
+        totals = {"updated": 0, "created": 0}
+
+        async def _save_batch(records: list[tuple[str, str, str]], processed: list[str]) -> None:
+            nonlocal redis
+            updated, created = await ctx.q_member_service().upsert_many(records)
+            totals["updated"] += updated
+            totals["created"] += created
+            if redis is None:
+                return
+            # 每批写库后记录断点，任务中断后下次从剩余部分继续
+            try:
+                await redis.sadd(_QQ_INFO_CHECKPOINT_KEY, *processed)
+                await redis.expire(_QQ_INFO_CHECKPOINT_KEY, _QQ_INFO_CHECKPOINT_TTL)
+            except Exception:
+                LOGGER.warning("save qq info checkpoint failed, continue without it", exc_info = True)
+                redis = None
+
+        resolver = ctx.profile_resolver()
+        resolver.reset_stats()
+        processed = await ctx.qq_info_service().refresh_many(
+            candidates,
+            _save_batch,
+            fetch = lambda qq: resolver.resolve(bot, qq),
+        )
+        if processed >= len(candidates):
+            await _clear_checkpoint()
+        LOGGER.info(
+            "qq info refreshed: processed=%s/%s updated=%s created=%s sources=%s",
+            processed,
+            len(candidates),
+            totals["updated"],
+            totals["created"],
+            resolver.stats,
+        )
 
     async def blacklist_check_job() -> None:
-        black_list = await ctx.blacklist_service().list_all()
-        if not black_list:
+        black_ids = await ctx.blacklist_service().id_set()
+        if not black_ids:
             return
 
         check_groups = list(dict.fromkeys(ctx.settings.group_chat + ctx.settings.group_res))
-        group_names = {gid: await _get_group_name(gid) for gid in check_groups}
-
-        lines = ["【黑名单巡检】"]
-        hit_count = 0
-        for item in black_list:
-            present_groups: list[str] = []
-            for gid in check_groups:
-                try:
-                    await bot.api.get_group_member_info(gid, item.qq_id)
-                    present_groups.append(group_names.get(gid, gid))
-                except Exception:
-                    continue
-            if present_groups:
-                hit_count += 1
-                lines.append(f"{item.qq_id} 仍在：{', '.join(present_groups)}")
+        group_names = await _get_group_names(check_groups)
+
+        # 每个群只拉一次成员列表，与黑名单集合求交集
+        hits: dict[int, list[str]] = {}
+        failed_groups: list[str] = []
+        for gid in check_groups:
+            member_ids = await ctx.group_roster_service().member_ids(bot, gid, refresh = True)
+            if member_ids is None:
+                failed_groups.append(group_names.get(gid, gid))
+                continue
+            for qq in member_ids & black_ids:
+                hits.setdefault(qq, []).append(group_names.get(gid, gid))
 
-        if hit_count == 0:
+        # 有群未能检查时即使没有命中也要通知，避免被当成巡检通过
+        if not hits and not failed_groups:
             return
-        await _notify_admin_groups("\n".join(lines))
+        lines = ["【黑名单巡检】"]
+        for qq in sorted(hits):
+            lines.append(f"{qq} 仍在：{', '.join(hits[qq])}")
+        if not hits:
+            lines.append("已检查的群中未发现黑名单成员。")
+        if failed_groups:
+            lines.append(f"成员列表获取失败（未检查）：{', '.join(failed_groups)}")
+        await _notify_admin_groups("\n".join(lines), kind = "blacklist_check", collapse = True)
 
     async def clear_invalid_notice_job() -> None:
         LOGGER.info("clear invalid notice: scheduled reminder at 21:00")
 
-    async def clear_invalid_job() -> None:
-        admin_members, _ = await _get_group_members(ctx.settings.group_admin)
-        res_members, _ = await _get_group_members(ctx.settings.group_res)
-        chat_members, _ = await _get_group_members(ctx.settings.group_chat)
+    async def _run_clear_invalid() -> int | None:
+        """执行失效人员清理，返回发现人数；名单加载失败返回 None。"""
+        admin_groups = set(ctx.settings.group_admin)
+        res_groups = set(ctx.settings.group_res)
+        chat_groups = set(ctx.settings.group_chat)
+        all_members, _ = await _get_group_members(
+            list(dict.fromkeys(ctx.settings.group_admin + ctx.settings.group_res + ctx.settings.group_chat))
+        )
 
-        if not res_members or not chat_members:
+        # 一次遍历同时得到管理群/聊天群成员集合与资源群成员
+        admin_ids: set[str] = set()
+        chat_ids: set[str] = set()
+        res_members: list[dict] = []
+        for m in all_members:
+            gid = m["group_id"]
+            if gid in admin_groups:
+                admin_ids.add(m["user_id"])
+            if gid in chat_groups:
+                chat_ids.add(m["user_id"])
+            if gid in res_groups:
+                res_members.append(m)
+
+        if not res_members or not chat_ids:
             LOGGER.warning("clear invalid skipped: failed to load res/chat members")
-            return
-
-        admin_ids = {m["user_id"] for m in admin_members}
-        chat_ids = {m["user_id"] for m in chat_members}
+            return None
 
         invalid_rows: list[dict] = []
         for m in res_members:
@@ -423,20 +552,55 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
 
         if not invalid_rows:
             LOGGER.info("clear invalid finished: no invalid members")
-            return
+            return 0
 
-        report = export_invalid_members_excel(
+        report = await export_invalid_members_excel(
             invalid_rows,
             output_dir = ctx.settings.scheduler_report_output_dir,
             title = "资源群失效人员名单",
+            fmt = ctx.settings.scheduler_report_format,
         )
 
         await _notify_admin_groups(f"【失效人员清理】发现 {len(invalid_rows)} 人，已生成名单：{report.name}")
         for gid in ctx.settings.group_admin:
             try:
-                await bot.api.send_group_file(gid, str(report), name = report.name)
+                await ctx.outbound_queue_service().send_group_file(bot, gid, str(report), name = report.name)
             except Exception:
                 LOGGER.exception("send invalid member excel failed: group_id=%s", gid)
+        return len(invalid_rows)
+
+    async def clear_invalid_job() -> None:
+        async with clear_invalid_lock:
+            await _run_clear_invalid()
+
+    async def _clear_invalid_on_demand(event: GroupMessageEvent) -> None:
+        try:
+            count = await _run_clear_invalid()
+        except Exception:
+            LOGGER.exception("clear invalid on demand failed")
+            await event.reply(text = "失效人员清理失败，请查看日志。", at = False)
+            return
+        if count is None:
+            await event.reply(text = "失效人员清理跳过：资源群或聊天群成员名单加载失败。", at = False)
+        elif count == 0:
+            await event.reply(text = "失效人员清理完成：未发现失效人员。", at = False)
+
+    async def on_clear_invalid_command(event: GroupMessageEvent) -> None:
+        """/clearInvalid：由 group_admin 的命令分发调用，鉴权已在那里完成。"""
+        if clear_invalid_lock.locked():
+            await event.reply(text = "失效人员清理正在进行中，请稍后。", at = False)
+            return
+        # 检查与加锁之间没有 await 让出，两条连续命令不会同时通过检查
+        await clear_invalid_lock.acquire()
+        # 后台执行，不阻塞消息处理；名单生成后照常发送到管理群
+        task = asyncio.create_task(_clear_invalid_on_demand(event))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        # 任务结束（含启动前被取消）时释放锁
+        task.add_done_callback(lambda _: clear_invalid_lock.release())
+        await event.reply(text = "已开始失效人员清理，完成后发送名单。", at = False)
+
+    ctx.register_admin_command("/clearInvalid", on_clear_invalid_command)
 
     def _register_jobs() -> None:
         if scheduler is None:
@@ -534,6 +698,13 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
     @bot.on_startup()
     async def on_scheduler_startup(event: MetaEvent) -> None:
         nonlocal scheduler, scheduler_tz
+        ctx.qq_monitor_service().add_recovery_listener(_drain_outbox)
+        # 上次运行遗留的待补发消息：当前无故障记录时直接补发
+        if not await ctx.qq_monitor_service().is_active():
+            task = asyncio.create_task(_drain_outbox())
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+
         if not ctx.settings.scheduler_enabled:
             LOGGER.info("scheduler disabled by config")
             return
@@ -561,10 +732,12 @@ def register_scheduler_handlers(bot: BotClient, ctx: AppContext) -> None:
     @bot.on_shutdown()
     async def on_scheduler_shutdown(event: MetaEvent) -> None:
         nonlocal scheduler
-        if scheduler is None:
-            return
         try:
-            scheduler.shutdown(wait = False)
-            LOGGER.info("scheduler stopped")
+            if scheduler is not None:
+                scheduler.shutdown(wait = False)
+                LOGGER.info("scheduler stopped")
         finally:
             scheduler = None
+            await ctx.qq_info_service().close()
+            # 调度器未启用时其他插件也会更新故障状态，关闭时总是写盘
+            await ctx.qq_monitor_service().flush()
@@ -77,6 +77,9 @@ class Settings:
 
     admins: list[str]
     blacklist_command: str
+    blacklist_cache_refresh_seconds: int
+    group_roster_ttl_seconds: int
+    group_roster_fetch_concurrency: int
 
     group_test: list[str]
     group_admin: list[str]
@@ -90,6 +93,35 @@ class Settings:
     archive_keep_local_copy: bool
     archive_watermark_enabled: bool
     archive_watermark_text: str
+    archive_command_timeout: float
+    archive_command_concurrency: int
+    archive_compression_level: int
+    archive_compression_threads: int
+    archive_message_concurrency: int
+    archive_fast_lane_max_mb: int
+    archive_slow_lane_min_mb: int
+    archive_fast_lane_concurrency: int
+    archive_normal_lane_concurrency: int
+    archive_slow_lane_concurrency: int
+    archive_watermark_max_mb: int
+    archive_pass_through_enabled: bool
+    archive_download_chunk_mb: int
+    archive_download_concurrency: int
+    archive_download_ranged_min_mb: int
+    archive_download_verify_md5: bool
+    archive_cache_max_mb: int
+    archive_cache_partial_ttl_hours: int
+    archive_local_store_cas: bool
+    archive_flight_lock_seconds: int
+    archive_flight_wait_seconds: int
+    archive_flight_result_seconds: int
+    archive_queue_enabled: bool
+    archive_queue_stream: str
+    archive_queue_group: str
+    archive_queue_dead_letter: str
+    archive_queue_max_retries: int
+    archive_queue_claim_idle_seconds: int
+    archive_worker_concurrency: int
 
     meilisearch_host: str
     meilisearch_api_key: str
@@ -101,6 +133,13 @@ class Settings:
     r2_bucket: str
     r2_public_url: str
     r2_path_prefix: str
+    r2_region: str
+    r2_content_addressed: bool
+    r2_multipart_threshold_mb: int
+    r2_multipart_chunk_mb: int
+    r2_upload_concurrency: int
+    r2_max_inflight_mb: int
+    r2_max_attempts: int
 
     short_url_endpoint: str
     short_url_token: str
@@ -141,10 +180,27 @@ class Settings:
     nonsense_api_url: str
     nonsense_max_request_times: int
     qq_info_api_url: str
+    qq_info_refresh_max_age_days: int
+    qq_info_refresh_concurrency: int
+    profile_resolve_concurrency: int
+    profile_external_fallback: bool
     qq_monitor_alarm_group_aliases: list[str]
     qq_fault_alarm_state_path: str
+    qq_fault_state_flush_seconds: float
+    outbound_global_rate: float
+    outbound_global_burst: float
+    outbound_group_rate: float
+    outbound_group_burst: float
+    outbound_concurrency: int
+    admin_digest_window_seconds: int
+    admin_digest_samples: int
+    admin_digest_urgent_kinds: list[str]
+    outbox_enabled: bool
+    outbox_ttl_hours: int
+    outbox_max_entries: int
     query_polling_timeout_days: int
     scheduler_report_output_dir: str
+    scheduler_report_format: str
 
     @property
     def all_groups(self) -> list[str]:
@@ -208,6 +264,9 @@ def get_settings() -> Settings:
         redis_url = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"),
         admins = _to_list("ADMINS"),
         blacklist_command = os.getenv("BLACKLIST_COMMAND", "/拉黑"),
+        blacklist_cache_refresh_seconds = int(os.getenv("BLACKLIST_CACHE_REFRESH_SECONDS", "600")),
+        group_roster_ttl_seconds = int(os.getenv("GROUP_ROSTER_TTL_SECONDS", "21600")),
+        group_roster_fetch_concurrency = int(os.getenv("GROUP_ROSTER_FETCH_CONCURRENCY", "4")),
         group_test = _to_list("GROUP_TEST"),
         group_admin = _to_list("GROUP_ADMIN"),
         group_chat = _to_list("GROUP_CHAT"),
@@ -219,6 +278,35 @@ def get_settings() -> Settings:
         archive_keep_local_copy = _to_bool("ARCHIVE_KEEP_LOCAL_COPY", True),
         archive_watermark_enabled = _to_bool("ARCHIVE_WATERMARK_ENABLED", True),
         archive_watermark_text = os.getenv("ARCHIVE_WATERMARK_TEXT", "shareus.top"),
+        archive_command_timeout = float(os.getenv("ARCHIVE_COMMAND_TIMEOUT", "600")),
+        archive_command_concurrency = int(os.getenv("ARCHIVE_COMMAND_CONCURRENCY", "0")),
+        archive_compression_level = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "5")),
+        archive_compression_threads = int(os.getenv("ARCHIVE_COMPRESSION_THREADS", "0")),
+        archive_message_concurrency = int(os.getenv("ARCHIVE_MESSAGE_CONCURRENCY", "3")),
+        archive_fast_lane_max_mb = int(os.getenv("ARCHIVE_FAST_LANE_MAX_MB", "10")),
+        archive_slow_lane_min_mb = int(os.getenv("ARCHIVE_SLOW_LANE_MIN_MB", "100")),
+        archive_fast_lane_concurrency = int(os.getenv("ARCHIVE_FAST_LANE_CONCURRENCY", "4")),
+        archive_normal_lane_concurrency = int(os.getenv("ARCHIVE_NORMAL_LANE_CONCURRENCY", "2")),
+        archive_slow_lane_concurrency = int(os.getenv("ARCHIVE_SLOW_LANE_CONCURRENCY", "1")),
+        archive_watermark_max_mb = int(os.getenv("ARCHIVE_WATERMARK_MAX_MB", "0")),
+        archive_pass_through_enabled = _to_bool("ARCHIVE_PASS_THROUGH_ENABLED", True),
+        archive_download_chunk_mb = int(os.getenv("ARCHIVE_DOWNLOAD_CHUNK_MB", "8")),
+        archive_download_concurrency = int(os.getenv("ARCHIVE_DOWNLOAD_CONCURRENCY", "4")),
+        archive_download_ranged_min_mb = int(os.getenv("ARCHIVE_DOWNLOAD_RANGED_MIN_MB", "16")),
+        archive_download_verify_md5 = _to_bool("ARCHIVE_DOWNLOAD_VERIFY_MD5", True),
+        archive_cache_max_mb = int(os.getenv("ARCHIVE_CACHE_MAX_MB", "10240")),
+        archive_cache_partial_ttl_hours = int(os.getenv("ARCHIVE_CACHE_PARTIAL_TTL_HOURS", "24")),
+        archive_local_store_cas = _to_bool("ARCHIVE_LOCAL_STORE_CAS", True),
+        archive_flight_lock_seconds = int(os.getenv("ARCHIVE_FLIGHT_LOCK_SECONDS", "1800")),
+        archive_flight_wait_seconds = int(os.getenv("ARCHIVE_FLIGHT_WAIT_SECONDS", "900")),
+        archive_flight_result_seconds = int(os.getenv("ARCHIVE_FLIGHT_RESULT_SECONDS", "300")),
+        archive_queue_enabled = _to_bool("ARCHIVE_QUEUE_ENABLED", False),
+        archive_queue_stream = os.getenv("ARCHIVE_QUEUE_STREAM", "archive:jobs"),
+        archive_queue_group = os.getenv("ARCHIVE_QUEUE_GROUP", "archive-workers"),
+        archive_queue_dead_letter = os.getenv("ARCHIVE_QUEUE_DEAD_LETTER", "archive:jobs:dead"),
+        archive_queue_max_retries = int(os.getenv("ARCHIVE_QUEUE_MAX_RETRIES", "3")),
+        archive_queue_claim_idle_seconds = int(os.getenv("ARCHIVE_QUEUE_CLAIM_IDLE_SECONDS", "300")),
+        archive_worker_concurrency = int(os.getenv("ARCHIVE_WORKER_CONCURRENCY", "2")),
         meilisearch_host = os.getenv("MEILISEARCH_HOST", ""),
         meilisearch_api_key = os.getenv("MEILISEARCH_API_KEY", ""),
         meilisearch_index = os.getenv("MEILISEARCH_INDEX", "archived_file"),
@@ -228,6 +316,13 @@ def get_settings() -> Settings:
         r2_bucket = os.getenv("R2_BUCKET", ""),
         r2_public_url = os.getenv("R2_PUBLIC_URL", ""),
         r2_path_prefix = os.getenv("R2_PATH_PREFIX", ""),
+        r2_region = os.getenv("R2_REGION", "auto"),
+        r2_content_addressed = _to_bool("R2_CONTENT_ADDRESSED", False),
+        r2_multipart_threshold_mb = int(os.getenv("R2_MULTIPART_THRESHOLD_MB", "16")),
+        r2_multipart_chunk_mb = int(os.getenv("R2_MULTIPART_CHUNK_MB", "16")),
+        r2_upload_concurrency = int(os.getenv("R2_UPLOAD_CONCURRENCY", "4")),
+        r2_max_inflight_mb = int(os.getenv("R2_MAX_INFLIGHT_MB", "256")),
+        r2_max_attempts = int(os.getenv("R2_MAX_ATTEMPTS", "5")),
         short_url_endpoint = os.getenv("SHORT_URL_ENDPOINT", ""),
         short_url_token = os.getenv("SHORT_URL_TOKEN", ""),
         short_url_bearer = _to_bool("SHORT_URL_BEARER", True),
@@ -266,8 +361,25 @@ def get_settings() -> Settings:
         nonsense_api_url = os.getenv("NONSENSE_API_URL", "https://api.qqsuu.cn/api/dm-saylove"),
         nonsense_max_request_times = int(os.getenv("NONSENSE_MAX_REQUEST_TIMES", "5")),
         qq_info_api_url = os.getenv("QQ_INFO_API_URL", "https://api.szfx.top/qq/info/?qq="),
+        qq_info_refresh_max_age_days = int(os.getenv("QQ_INFO_REFRESH_MAX_AGE_DAYS", "7")),
+        qq_info_refresh_concurrency = int(os.getenv("QQ_INFO_REFRESH_CONCURRENCY", "8")),
+        profile_resolve_concurrency = int(os.getenv("PROFILE_RESOLVE_CONCURRENCY", "4")),
+        profile_external_fallback = _to_bool("PROFILE_EXTERNAL_FALLBACK", True),
         qq_monitor_alarm_group_aliases = _to_list("QQ_MONITOR_ALARM_GROUPS") or ["admin", "test"],
         qq_fault_alarm_state_path = os.getenv("QQ_FAULT_ALARM_STATE_PATH", "./data/runtime/qq_fault_alarm.json"),
+        qq_fault_state_flush_seconds = float(os.getenv("QQ_FAULT_STATE_FLUSH_SECONDS", "1")),
+        outbound_global_rate = float(os.getenv("OUTBOUND_GLOBAL_RATE", "2")),
+        outbound_global_burst = float(os.getenv("OUTBOUND_GLOBAL_BURST", "5")),
+        outbound_group_rate = float(os.getenv("OUTBOUND_GROUP_RATE", "0.5")),
+        outbound_group_burst = float(os.getenv("OUTBOUND_GROUP_BURST", "3")),
+        outbound_concurrency = int(os.getenv("OUTBOUND_CONCURRENCY", "3")),
+        admin_digest_window_seconds = int(os.getenv("ADMIN_DIGEST_WINDOW_SECONDS", "60")),
+        admin_digest_samples = int(os.getenv("ADMIN_DIGEST_SAMPLES", "5")),
+        admin_digest_urgent_kinds = _to_list("ADMIN_DIGEST_URGENT_KINDS") or ["blacklist"],
+        outbox_enabled = _to_bool("OUTBOX_ENABLED", True),
+        outbox_ttl_hours = int(os.getenv("OUTBOX_TTL_HOURS", "24")),
+        outbox_max_entries = int(os.getenv("OUTBOX_MAX_ENTRIES", "200")),
         query_polling_timeout_days = int(os.getenv("QUERY_POLLING_TIMEOUT_DAYS", "7")),
         scheduler_report_output_dir = os.getenv("SCHEDULER_REPORT_OUTPUT_DIR", "./data/reports"),
+        scheduler_report_format = os.getenv("SCHEDULER_REPORT_FORMAT", "xlsx").strip().lower(),
     )
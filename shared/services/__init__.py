@@ -1,11 +1,20 @@
 """Service layer modules."""
 
+from shared.services.admin_digest_service import AdminDigestService
 from shared.services.alist_service import AlistService
+from shared.services.archive_cache_service import ArchiveCacheService
+from shared.services.archive_flight_service import ArchiveFlightService
+from shared.services.archive_queue_service import ArchiveJob, ArchiveQueueService
 from shared.services.archive_service import ArchiveService
 from shared.services.blacklist_service import BlackListService
 from shared.services.file_processor_service import FileProcessorService
+from shared.services.group_roster_service import GroupRosterService
+from shared.services.local_store_service import LocalStoreService
 from shared.services.meilisearch_service import MeiliSearchService
 from shared.services.nonsense_service import NonsenseService
+from shared.services.outbound_queue_service import OutboundQueueService
+from shared.services.outbox_service import OutboxService
+from shared.services.profile_resolver import ProfileResolver
 from shared.services.q_member_service import QMemberService
 from shared.services.qq_info_service import QQInfoService
 from shared.services.qq_monitor_service import QQMonitorService
@@ -14,12 +23,22 @@ from shared.services.r2_service import R2Service
 from shared.services.short_url_service import ShortUrlService
 
 __all__ = [
+    "AdminDigestService",
     "AlistService",
+    "ArchiveCacheService",
+    "ArchiveFlightService",
+    "ArchiveJob",
+    "ArchiveQueueService",
     "ArchiveService",
     "BlackListService",
     "FileProcessorService",
+    "GroupRosterService",
+    "LocalStoreService",
     "MeiliSearchService",
     "NonsenseService",
+    "OutboundQueueService",
+    "OutboxService",
+    "ProfileResolver",
     "QMemberService",
     "QQInfoService",
     "QQMonitorService",
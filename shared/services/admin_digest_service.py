@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+from ncatbot.core import BotClient
+
+from shared.config import Settings
+from shared.services.outbound_queue_service import PRIORITY_MODERATION, PRIORITY_NOTICE, OutboundQueueService
+
+LOGGER = logging.getLogger(__name__)
+
+# 通知类别 -> 汇总标题
+KIND_BAN_WORD = "ban_word"
+KIND_QUERY_OVER_LIMIT = "query_over_limit"
+KIND_BLACKLIST = "blacklist"
+KIND_JOIN_BLOCKED = "join_blocked"
+
+_TITLES = {
+    KIND_BAN_WORD: "违禁词处理",
+    KIND_QUERY_OVER_LIMIT: "求文超限处理",
+    KIND_BLACKLIST: "拉黑",
+    KIND_JOIN_BLOCKED: "黑名单入群拦截",
+}
+
+
+@dataclass
+class _Bucket:
+    bot: BotClient
+    items: list[str] = field(default_factory = list)
+    total: int = 0
+
+
+class AdminDigestService:
+    """管理群通知合并：窗口内的第一条立即发送，其后的同类通知在窗口结束时合并为一条摘要；紧急类别直接发送。"""
+
+    def __init__(self, settings: Settings, outbound: OutboundQueueService) -> None:
+        self._settings = settings
+        self._outbound = outbound
+        self._window = max(0, settings.admin_digest_window_seconds)
+        self._samples = max(1, settings.admin_digest_samples)
+        self._urgent = set(settings.admin_digest_urgent_kinds)
+        self._buckets: dict[str, _Bucket] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def notify(self, bot: BotClient, kind: str, text: str) -> None:
+        if not self._window or kind in self._urgent:
+            await self._send(bot, text, urgent = kind in self._urgent)
+            return
+
+        bucket = self._buckets.get(kind)
+        if bucket is None:
+            # 窗口空闲：本条立即发送并开启窗口，窗口内的后续通知才合并
+            self._buckets[kind] = _Bucket(bot = bot)
+            task = asyncio.create_task(self._flush_later(kind))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+            await self._send(bot, text)
+            return
+        bucket.total += 1
+        if len(bucket.items) < self._samples:
+            bucket.items.append(text)
+
+    async def flush_all(self) -> None:
+        """立即发出所有未到期的摘要，关闭时调用。"""
+        for task in list(self._flush_tasks):
+            task.cancel()
+        for kind in list(self._buckets):
+            await self._flush(kind)
+
+    async def _flush_later(self, kind: str) -> None:
+        await asyncio.sleep(self._window)
+        await self._flush(kind)
+
+    async def _flush(self, kind: str) -> None:
+        bucket = self._buckets.pop(kind, None)
+        if bucket is None or not bucket.total:
+            return
+        if bucket.total == 1:
+            await self._send(bucket.bot, bucket.items[0])
+            return
+
+        title = _TITLES.get(kind, kind)
+        lines = [f"【{title}汇总】最近 {self._window} 秒共 {bucket.total} 条"]
+        for index, item in enumerate(bucket.items, start = 1):
+            lines.append(f"—— {index} ——")
+            lines.append(item)
+        omitted = bucket.total - len(bucket.items)
+        if omitted > 0:
+            lines.append(f"…其余 {omitted} 条已省略")
+        await self._send(bucket.bot, "\n".join(lines))
+
+    async def _send(self, bot: BotClient, text: str, *, urgent: bool = False) -> None:
+        priority = PRIORITY_MODERATION if urgent else PRIORITY_NOTICE
+        for group_id in self._settings.group_admin:
+            try:
+                await self._outbound.post_group_msg(bot, group_id, text, priority = priority)
+            except Exception:
+                LOGGER.exception("notify admin group failed: group_id=%s", group_id)
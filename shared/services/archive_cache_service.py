@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from shared.config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+_CACHE_DIR = "cache"
+_PARTIAL_DIR = ".partial"
+_ORPHAN_MIN_AGE = 3600
+
+
+@dataclass
+class CacheUsage:
+    files: int
+    bytes: int
+    limit: int
+    evicted_files: int
+    evicted_bytes: int
+
+
+class ArchiveCacheService:
+    """管理 archive_tmp_dir 下的本地下载副本：分片目录、字节预算、LRU 淘汰与启动清理。
+
+    stored/ 目录在无 R2 模式下是归档本体，不属于缓存，这里不会淘汰。
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._root = Path(settings.archive_tmp_dir)
+        self._cache_root = self._root / _CACHE_DIR
+        self._limit = max(0, settings.archive_cache_max_mb) * _MB
+        self._partial_ttl = max(0, settings.archive_cache_partial_ttl_hours) * 3600
+        # path -> size，按最近使用排序，头部最旧
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        # 文件键（flight_key）-> 缓存路径，用于命中复用；只覆盖本次运行登记的文件
+        self._keys: dict[str, Path] = {}
+        self._key_of: dict[Path, str] = {}
+        self._total = 0
+        self._evicted_files = 0
+        self._evicted_bytes = 0
+        self._lock = asyncio.Lock()
+        self._started = False
+
+    async def shard_dir(self, name: str) -> Path:
+        shard = hashlib.sha1(name.encode("utf-8")).hexdigest()[:2]
+        directory = self._cache_root / shard
+        await asyncio.to_thread(directory.mkdir, parents = True, exist_ok = True)
+        return directory
+
+    async def lookup(self, key: str) -> Path | None:
+        """按文件键查找保留的本地副本；命中时移到 LRU 尾部并更新修改时间，重启后仍按最近使用排序。"""
+        if not key:
+            return None
+        async with self._lock:
+            path = self._keys.get(key)
+            if path is None or path not in self._entries:
+                return None
+            try:
+                await asyncio.to_thread(os.utime, path)
+            except OSError:
+                # 文件已被外部删除
+                self._forget(path)
+                return None
+            self._entries.move_to_end(path)
+            return path
+
+    def usage(self) -> CacheUsage:
+        return CacheUsage(
+            files = len(self._entries),
+            bytes = self._total,
+            limit = self._limit,
+            evicted_files = self._evicted_files,
+            evicted_bytes = self._evicted_bytes,
+        )
+
+    async def startup(self) -> None:
+        """清理崩溃遗留的水印/临时文件与过期断点，并按修改时间重建 LRU 索引。"""
+        async with self._lock:
+            if self._started:
+                return
+            self._started = True
+            entries, removed = await asyncio.to_thread(self._scan)
+            for path, size in entries:
+                self._entries[path] = size
+                self._total += size
+            evicted = await self._evict_locked()
+        usage = self.usage()
+        LOGGER.info(
+            "archive cache ready: files=%s size=%.1fMB limit=%.1fMB orphans_removed=%s evicted=%s",
+            usage.files,
+            usage.bytes / _MB,
+            usage.limit / _MB,
+            removed,
+            evicted,
+        )
+
+    async def admit(self, path: Path, key: str = "") -> None:
+        """归档处理结束后登记保留的本地副本，并在超出预算时淘汰最久未用的文件。"""
+        try:
+            size = (await asyncio.to_thread(path.stat)).st_size
+        except OSError:
+            return
+        async with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._total -= previous
+            self._entries[path] = size
+            self._total += size
+            if key:
+                stale = self._keys.get(key)
+                if stale is not None and stale != path:
+                    self._key_of.pop(stale, None)
+                self._keys[key] = path
+                self._key_of[path] = key
+            await self._evict_locked()
+
+    def _forget(self, path: Path) -> None:
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total -= size
+        key = self._key_of.pop(path, None)
+        if key is not None and self._keys.get(key) == path:
+            self._keys.pop(key, None)
+
+    async def _evict_locked(self) -> int:
+        if not self._limit:
+            return 0
+        victims: list[tuple[Path, int]] = []
+        while self._total > self._limit and len(self._entries) > 1:
+            path, size = next(iter(self._entries.items()))
+            self._forget(path)
+            victims.append((path, size))
+        if not victims:
+            return 0
+        await asyncio.to_thread(self._remove_all, [path for path, _ in victims])
+        freed = sum(size for _, size in victims)
+        self._evicted_files += len(victims)
+        self._evicted_bytes += freed
+        LOGGER.info(
+            "archive cache evicted: files=%s freed=%.1fMB usage=%.1f/%.1fMB",
+            len(victims),
+            freed / _MB,
+            self._total / _MB,
+            self._limit / _MB,
+        )
+        return len(victims)
+
+    @staticmethod
+    def _remove_all(paths: list[Path]) -> None:
+        for path in paths:
+            try:
+                path.unlink(missing_ok = True)
+            except OSError:
+                LOGGER.debug("remove cached file failed: %s", path)
+
+    def _is_orphan(self, path: Path, now: float) -> bool:
+        try:
+            age = now - path.stat().st_mtime
+        except OSError:
+            return False
+        if path.parent.name == _PARTIAL_DIR:
+            return age > self._partial_ttl
+        # 水印中间文件只在处理过程中存在，留一小时余量避免误删其他进程正在处理的文件
+        name = path.name
+        return (".wm." in name or name.endswith(".tmp")) and age > _ORPHAN_MIN_AGE
+
+    def _scan(self) -> tuple[list[tuple[Path, int]], int]:
+        self._cache_root.mkdir(parents = True, exist_ok = True)
+        now = time.time()
+        removed = 0
+        found: list[tuple[float, Path, int]] = []
+
+        candidates: list[Path] = []
+        # 旧版本直接平铺在根目录下的下载文件也纳入管理
+        for child in self._root.iterdir():
+            if child.is_file():
+                candidates.append(child)
+            elif child.name == _PARTIAL_DIR:
+                candidates.extend(p for p in child.iterdir() if p.is_file())
+        for shard in self._cache_root.iterdir():
+            if not shard.is_dir():
+                continue
+            for child in shard.iterdir():
+                if child.is_file():
+                    candidates.append(child)
+                elif child.name == _PARTIAL_DIR:
+                    candidates.extend(p for p in child.iterdir() if p.is_file())
+
+        for path in candidates:
+            if self._is_orphan(path, now):
+                try:
+                    path.unlink(missing_ok = True)
+                    removed += 1
+                except OSError:
+                    LOGGER.debug("remove orphan file failed: %s", path)
+                continue
+            if path.parent.name == _PARTIAL_DIR:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, path, stat.st_size))
+
+        found.sort(key = lambda item: item[0])
+        return [(path, size) for _, path, size in found], removed
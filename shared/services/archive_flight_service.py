@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass
+
+from shared.config import Settings
+from shared.redis_client import get_redis
+
+LOGGER = logging.getLogger(__name__)
+
+_LOCK_PREFIX = "archive:inflight:lock:"
+_RESULT_PREFIX = "archive:inflight:result:"
+
+
+@dataclass
+class FlightResult:
+    archive_url: str
+    size: int
+    md5: str
+
+
+class ArchiveFlight:
+    """一次正在进行的归档；完成后必须调用 finish，成功时携带结果供后来者复用。"""
+
+    def __init__(self, owner: "ArchiveFlightService", key: str, token: str) -> None:
+        self._owner = owner
+        self.key = key
+        self._token = token
+        self._finished = False
+
+    async def finish(self, result: FlightResult | None) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        await self._owner._finish(self.key, self._token, result)
+
+
+class ArchiveFlightService:
+    """同一文件（按消息段 md5/大小）同时只归档一次：进程内用 Event，跨进程用 Redis SET NX 锁。"""
+
+    def __init__(self, settings: Settings) -> None:
+        self._lock_ttl_ms = max(1, settings.archive_flight_lock_seconds) * 1000
+        self._wait_seconds = max(0, settings.archive_flight_wait_seconds)
+        self._result_ttl = max(1, settings.archive_flight_result_seconds)
+        self._local: dict[str, asyncio.Event] = {}
+        self._local_results: dict[str, tuple[float, FlightResult]] = {}
+
+    async def acquire(self, key: str) -> tuple[ArchiveFlight | None, FlightResult | None]:
+        """返回 (flight, None) 表示由自己处理；(None, result) 表示复用他人结果；(None, None) 表示等待超时，按常规处理。"""
+        deadline = time.monotonic() + self._wait_seconds
+        while True:
+            result = self._local_result(key) or await self._remote_result(key)
+            if result is not None:
+                return None, result
+
+            event = self._local.get(key)
+            if event is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None
+                try:
+                    await asyncio.wait_for(event.wait(), timeout = remaining)
+                except asyncio.TimeoutError:
+                    return None, None
+                continue
+
+            event = asyncio.Event()
+            self._local[key] = event
+            token = uuid.uuid4().hex
+            try:
+                redis = await get_redis()
+                locked = bool(await redis.set(_LOCK_PREFIX + key, token, nx = True, px = self._lock_ttl_ms))
+            except Exception:
+                # Redis 不可用时退化为仅进程内去重
+                LOGGER.warning("archive flight lock unavailable, fallback to local: key=%s", key)
+                locked = True
+                token = ""
+            if locked:
+                return ArchiveFlight(self, key, token), None
+
+            # 其他进程正在处理：释放本地占位，轮询等待对方完成
+            self._local.pop(key, None)
+            event.set()
+            if time.monotonic() >= deadline:
+                return None, None
+            await asyncio.sleep(1)
+
+    async def _finish(self, key: str, token: str, result: FlightResult | None) -> None:
+        if result is not None:
+            self._local_results[key] = (time.monotonic() + self._result_ttl, result)
+        try:
+            redis = await get_redis()
+            if result is not None:
+                await redis.set(_RESULT_PREFIX + key, json.dumps(asdict(result)), ex = self._result_ttl)
+            if token:
+                # 仅当锁仍归自己所有时才删除，避免锁过期后误删他人的锁
+                async with redis.pipeline(transaction = True) as pipe:
+                    await pipe.watch(_LOCK_PREFIX + key)
+                    if await pipe.get(_LOCK_PREFIX + key) == token:
+                        pipe.multi()
+                        pipe.delete(_LOCK_PREFIX + key)
+                        await pipe.execute()
+                    else:
+                        await pipe.unwatch()
+        except Exception:
+            LOGGER.warning("archive flight release failed: key=%s", key)
+        finally:
+            event = self._local.pop(key, None)
+            if event is not None:
+                event.set()
+
+    async def retract(self, key: str) -> None:
+        """撤回已发布的结果（对应文件入库失败），之后的处理方会重新归档。"""
+        self._local_results.pop(key, None)
+        try:
+            redis = await get_redis()
+            await redis.delete(_RESULT_PREFIX + key)
+        except Exception:
+            LOGGER.warning("archive flight retract failed: key=%s", key)
+
+    def _local_result(self, key: str) -> FlightResult | None:
+        now = time.monotonic()
+        for item_key, (expire_at, _) in list(self._local_results.items()):
+            if expire_at <= now:
+                self._local_results.pop(item_key, None)
+        item = self._local_results.get(key)
+        return item[1] if item else None
+
+    async def _remote_result(self, key: str) -> FlightResult | None:
+        try:
+            redis = await get_redis()
+            raw = await redis.get(_RESULT_PREFIX + key)
+        except Exception:
+            return None
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+            return FlightResult(
+                archive_url = str(data["archive_url"]),
+                size = int(data["size"]),
+                md5 = str(data["md5"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
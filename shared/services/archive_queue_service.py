@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+from redis.exceptions import ResponseError
+
+from shared.config import Settings
+from shared.redis_client import get_redis
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveJob:
+    url: str
+    name: str
+    sender_id: str
+    group_id: str = ""
+    message_id: str = ""
+    md5_candidates: list[str] = field(default_factory = list)
+    size: int = 0
+    attempts: int = 0
+
+    def to_fields(self) -> dict[str, str]:
+        return {
+            "url": self.url,
+            "name": self.name,
+            "sender_id": self.sender_id,
+            "group_id": self.group_id,
+            "message_id": self.message_id,
+            "md5": ",".join(self.md5_candidates),
+            "size": str(self.size),
+            "attempts": str(self.attempts),
+        }
+
+    @classmethod
+    def from_fields(cls, fields: dict[str, str]) -> "ArchiveJob":
+        def _int(name: str) -> int:
+            try:
+                return int(fields.get(name) or 0)
+            except ValueError:
+                return 0
+
+        return cls(
+            url = fields.get("url", ""),
+            name = fields.get("name", ""),
+            sender_id = fields.get("sender_id", ""),
+            group_id = fields.get("group_id", ""),
+            message_id = fields.get("message_id", ""),
+            md5_candidates = [v for v in (fields.get("md5") or "").split(",") if v],
+            size = _int("size"),
+            attempts = _int("attempts"),
+        )
+
+
+class ArchiveQueueService:
+    """基于 Redis Stream + 消费组的归档任务队列，提供至少一次投递语义。"""
+
+    def __init__(self, settings: Settings) -> None:
+        self._stream = settings.archive_queue_stream
+        self._group = settings.archive_queue_group
+        self._dead_letter = settings.archive_queue_dead_letter
+        self._max_retries = max(0, settings.archive_queue_max_retries)
+        self._claim_idle_ms = max(1, settings.archive_queue_claim_idle_seconds) * 1000
+        self._max_len = 100_000
+
+    @property
+    def claim_idle_seconds(self) -> float:
+        return self._claim_idle_ms / 1000
+
+    async def enqueue(self, job: ArchiveJob) -> str:
+        redis = await get_redis()
+        return await redis.xadd(self._stream, job.to_fields(), maxlen = self._max_len, approximate = True)
+
+    async def ensure_group(self) -> None:
+        redis = await get_redis()
+        try:
+            await redis.xgroup_create(self._stream, self._group, id = "0", mkstream = True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def claim_stale(self, consumer: str, count: int) -> list[tuple[str, ArchiveJob]]:
+        """接管其他消费者崩溃后遗留、超过空闲阈值仍未 ACK 的任务。"""
+        redis = await get_redis()
+        result = await redis.xautoclaim(
+            self._stream,
+            self._group,
+            consumer,
+            min_idle_time = self._claim_idle_ms,
+            start_id = "0-0",
+            count = count,
+        )
+        return await self._parse_entries(result[1] if len(result) > 1 else [])
+
+    async def read(self, consumer: str, count: int, block_ms: int = 5000) -> list[tuple[str, ArchiveJob]]:
+        redis = await get_redis()
+        result = await redis.xreadgroup(
+            self._group,
+            consumer,
+            streams = {self._stream: ">"},
+            count = count,
+            block = block_ms,
+        )
+        entries: list = []
+        for _, items in result or []:
+            entries.extend(items)
+        return await self._parse_entries(entries)
+
+    async def _parse_entries(self, entries: list) -> list[tuple[str, ArchiveJob]]:
+        jobs: list[tuple[str, ArchiveJob]] = []
+        for entry_id, fields in entries:
+            if not fields:
+                # 条目已被裁剪，只剩 PEL 引用
+                await self.ack(entry_id)
+                continue
+            jobs.append((entry_id, ArchiveJob.from_fields(fields)))
+        return jobs
+
+    async def heartbeat(self, consumer: str, entry_id: str) -> None:
+        # 重新认领自身任务以重置空闲时间，防止长任务被其他消费者误接管
+        redis = await get_redis()
+        await redis.xclaim(
+            self._stream,
+            self._group,
+            consumer,
+            min_idle_time = 0,
+            message_ids = [entry_id],
+            justid = True,
+        )
+
+    async def ack(self, entry_id: str) -> None:
+        redis = await get_redis()
+        await redis.xack(self._stream, self._group, entry_id)
+
+    async def retry_or_dead_letter(self, entry_id: str, job: ArchiveJob, error: str) -> bool:
+        """重新入队（attempts+1）或转入死信队列；返回是否已转入死信。"""
+        redis = await get_redis()
+        job.attempts += 1
+        dead = job.attempts > self._max_retries
+        async with redis.pipeline(transaction = True) as pipe:
+            if dead:
+                fields = job.to_fields()
+                fields["error"] = error[:500]
+                fields["failed_at"] = str(int(time.time()))
+                pipe.xadd(self._dead_letter, fields, maxlen = self._max_len, approximate = True)
+            else:
+                pipe.xadd(self._stream, job.to_fields(), maxlen = self._max_len, approximate = True)
+            pipe.xack(self._stream, self._group, entry_id)
+            await pipe.execute()
+        if dead:
+            LOGGER.error("archive job moved to dead letter: entry=%s name=%s error=%s", entry_id, job.name, error)
+        return dead
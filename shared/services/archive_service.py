@@ -128,3 +128,28 @@ class ArchiveService:
             await session.commit()
             await session.refresh(item)
             return item
+
+    async def save_archives(self, rows: list[dict]) -> list[ArchivedFile]:
+        if not rows:
+            return []
+
+        now = datetime.now()
+        items = [
+            ArchivedFile(
+                id=uuid.uuid4().hex,
+                name=row["file_name"],
+                sender_id=int(row["sender_id"]),
+                size=int(row.get("size") or 0),
+                md5=row.get("md5") or "",
+                enabled=int(row.get("enabled") or 0),
+                del_flag=0,
+                origin_url=row.get("origin_url") or "",
+                archive_url=row["archive_url"],
+                archive_date=now,
+            )
+            for row in rows
+        ]
+        async with self._session_factory() as session:
+            session.add_all(items)
+            await session.commit()
+            return items
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from shared.config import Settings
 from shared.models.black_list import BlackList
+from shared.redis_client import get_redis
+
+LOGGER = logging.getLogger(__name__)
+
+_CHANNEL = "blacklist:changed"
+
+
+def _to_qq_int(qq_id: str | int) -> int | None:
+    text = str(qq_id).strip()
+    return int(text) if text.isdigit() else None
 
 
 class BlackListService:
-    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], settings: Settings) -> None:
         self._session_factory = session_factory
+        self._refresh_seconds = max(0, settings.blacklist_cache_refresh_seconds)
+        # 内存黑名单：QQ 号整数集合，None 表示尚未加载
+        self._ids: set[int] | None = None
+        self._load_lock = asyncio.Lock()
+        self._sync_task: asyncio.Task | None = None
 
     async def get_by_qq(self, qq_id: str) -> BlackList | None:
         async with self._session_factory() as session:
@@ -29,6 +49,97 @@ class BlackListService:
             rows = (await session.execute(stmt)).scalars().all()
             return list(rows)
 
+    async def contains(self, qq_id: str | int) -> bool:
+        """入群审核用：命中内存集合即返回，不访问数据库。"""
+        key = _to_qq_int(qq_id)
+        if key is None:
+            return await self.get_by_qq(str(qq_id)) is not None
+        if self._ids is None:
+            await self.load()
+        return key in (self._ids or ())
+
+    async def id_set(self) -> set[int]:
+        if self._ids is None:
+            await self.load()
+        return set(self._ids or ())
+
+    async def load(self) -> None:
+        async with self._load_lock:
+            async with self._session_factory() as session:
+                rows = (
+                    await session.execute(select(BlackList.qq_id).where(BlackList.del_flag == 0))
+                ).scalars().all()
+            ids = {key for key in (_to_qq_int(qq) for qq in rows) if key is not None}
+            self._ids = ids
+        LOGGER.info("blacklist cache loaded: size=%s", len(ids))
+
+    async def start_sync(self) -> None:
+        """加载黑名单并订阅变更频道；其他进程拉黑后通过 pub/sub 同步到本进程。"""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        await self.load()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop_sync(self) -> None:
+        if self._sync_task is None:
+            return
+        self._sync_task.cancel()
+        try:
+            await self._sync_task
+        except asyncio.CancelledError:
+            pass
+        self._sync_task = None
+
+    async def _sync_loop(self) -> None:
+        first = True
+        while True:
+            pubsub = None
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(_CHANNEL)
+                # 订阅断开期间可能漏掉消息，重新订阅后全量重载一次
+                if not first:
+                    await self.load()
+                first = False
+                last_load = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages = True, timeout = 1.0)
+                    if message is not None:
+                        self._apply(str(message.get("data") or ""))
+                    # 数据库中直接修改 del_flag 不会发布消息，定期全量校准
+                    if self._refresh_seconds and time.monotonic() - last_load >= self._refresh_seconds:
+                        await self.load()
+                        last_load = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LOGGER.warning("blacklist sync interrupted, retry in 5s", exc_info = True)
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        LOGGER.debug("close blacklist pubsub failed")
+
+    def _apply(self, data: str) -> None:
+        action, _, value = data.partition(":")
+        key = _to_qq_int(value)
+        if self._ids is None or key is None:
+            return
+        if action == "add":
+            self._ids.add(key)
+        elif action == "remove":
+            self._ids.discard(key)
+
+    async def _publish(self, action: str, qq_id: str) -> None:
+        try:
+            redis = await get_redis()
+            await redis.publish(_CHANNEL, f"{action}:{qq_id}")
+        except Exception:
+            LOGGER.warning("publish blacklist change failed: action=%s qq_id=%s", action, qq_id)
+
     async def add(
         self,
         qq_id: str,
@@ -61,4 +172,7 @@ class BlackListService:
             session.add(item)
             await session.commit()
             await session.refresh(item)
-            return item
+
+        self._apply(f"add:{qq_id}")
+        await self._publish("add", str(qq_id))
+        return item
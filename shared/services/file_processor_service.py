@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from dataclasses import dataclass
 from pathlib import Path
@@ -7,10 +8,12 @@ from pathlib import Path
 from shared.config import Settings
 from shared.utils.pdf_watermark import apply_pdf_watermark
 from shared.utils.text_watermark import apply_text_watermark
-from shared.utils.zip_watermark import apply_zip_txt_watermark
+from shared.utils.zip_watermark import ArchiveCommandOptions, apply_zip_txt_watermark
 
 LOGGER = logging.getLogger(__name__)
 
+_WATERMARK_SUFFIXES = {".pdf", ".txt", ".zip", ".7z", ".rar"}
+
 
 @dataclass
 class ProcessedArchiveFile:
@@ -21,23 +24,50 @@ class ProcessedArchiveFile:
 class FileProcessorService:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
+        self._archive_options = ArchiveCommandOptions(
+            timeout = settings.archive_command_timeout,
+            concurrency = settings.archive_command_concurrency,
+            compression_level = settings.archive_compression_level,
+            threads = settings.archive_compression_threads,
+        )
+
+    def will_modify(self, file_name: str, size: int = 0) -> bool:
+        """判断文件是否会被加水印；不会被修改的文件可直接流式转存，无需落盘。"""
+        if not self._settings.archive_watermark_enabled:
+            return False
+        max_bytes = self._settings.archive_watermark_max_mb * 1024 * 1024
+        if max_bytes > 0 and size > max_bytes:
+            return False
+        return Path(file_name).suffix.lower() in _WATERMARK_SUFFIXES
 
-    def prepare_for_archive(self, local_file: Path) -> ProcessedArchiveFile:
+    async def prepare_for_archive(self, local_file: Path) -> ProcessedArchiveFile:
         temp_files: list[Path] = []
         archive_source = local_file
 
         if not self._settings.archive_watermark_enabled:
             return ProcessedArchiveFile(archive_source=archive_source, temp_files=temp_files)
 
+        max_bytes = self._settings.archive_watermark_max_mb * 1024 * 1024
+        if max_bytes > 0 and local_file.stat().st_size > max_bytes:
+            # 超大文件跳过水印，避免解压/重打包长时间占用慢车道
+            LOGGER.info("watermark skipped for large file: %s", local_file)
+            return ProcessedArchiveFile(archive_source=archive_source, temp_files=temp_files)
+
         suffix = local_file.suffix.lower()
         wm_path = local_file.with_name(f"{local_file.stem}.wm{local_file.suffix}")
         try:
             if suffix == ".pdf":
-                apply_pdf_watermark(local_file, wm_path, self._settings.archive_watermark_text)
+                await asyncio.to_thread(
+                    apply_pdf_watermark,
+                    local_file,
+                    wm_path,
+                    self._settings.archive_watermark_text,
+                )
                 archive_source = wm_path
                 temp_files.append(wm_path)
             elif suffix == ".txt":
-                apply_text_watermark(
+                await asyncio.to_thread(
+                    apply_text_watermark,
                     local_file,
                     wm_path,
                     "",
@@ -46,11 +76,12 @@ class FileProcessorService:
                 archive_source = wm_path
                 temp_files.append(wm_path)
             elif suffix in {".zip", ".7z", ".rar"}:
-                apply_zip_txt_watermark(
+                await apply_zip_txt_watermark(
                     local_file,
                     wm_path,
                     "",
                     times=3,
+                    options=self._archive_options,
                 )
                 archive_source = wm_path
                 temp_files.append(wm_path)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from ncatbot.core import BotClient
+
+from shared.config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots = True)
+class RosterMember:
+    user_id: int
+    nickname: str = ""
+    card: str = ""
+    title: str = ""
+    role: str = "member"
+    join_time: int = 0
+    last_sent_time: int = 0
+
+
+@dataclass
+class _Roster:
+    fetched_at: float
+    members: dict[int, RosterMember] = field(default_factory = dict)
+
+
+class GroupRosterService:
+    """群成员名单镜像：启动时全量拉取一次，之后由入群/退群/改名片/发言事件增量维护。
+
+    group_roster_ttl_seconds 到期后下次访问会重新全量拉取，用于校准漏掉的事件。
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._ttl = max(0, settings.group_roster_ttl_seconds)
+        self._fetch_semaphore = asyncio.Semaphore(max(1, settings.group_roster_fetch_concurrency))
+        self._rosters: dict[str, _Roster] = {}
+        self._group_names: dict[str, str] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def bootstrap(self, bot: BotClient, group_ids: list[str]) -> None:
+        unique_groups = list(dict.fromkeys(str(gid) for gid in group_ids))
+        await self._load_group_names(bot)
+        results = await asyncio.gather(*(self.members(bot, gid, refresh = True) for gid in unique_groups))
+        loaded = sum(1 for result in results if result is not None)
+        LOGGER.info(
+            "group roster mirror ready: groups=%s/%s members=%s",
+            loaded,
+            len(unique_groups),
+            sum(len(result) for result in results if result is not None),
+        )
+
+    async def members(self, bot: BotClient, group_id: str, *, refresh: bool = False) -> list[RosterMember] | None:
+        """返回群成员列表；拉取失败且无镜像时返回 None。"""
+        roster = await self._roster(bot, str(group_id), refresh = refresh)
+        return list(roster.members.values()) if roster is not None else None
+
+    async def member_ids(self, bot: BotClient, group_id: str, *, refresh: bool = False) -> set[int] | None:
+        roster = await self._roster(bot, str(group_id), refresh = refresh)
+        return set(roster.members) if roster is not None else None
+
+    async def contains(self, bot: BotClient, group_id: str, user_id: str | int) -> bool | None:
+        """None 表示名单不可用，调用方应按“可能在群”处理。"""
+        if not str(user_id).isdigit():
+            return None
+        roster = await self._roster(bot, str(group_id))
+        if roster is None:
+            return None
+        return int(user_id) in roster.members
+
+    def find_nickname(self, user_id: str | int) -> str:
+        """只查已加载的镜像，不触发拉取；未找到返回空串。"""
+        if not str(user_id).isdigit():
+            return ""
+        key = int(user_id)
+        for roster in self._rosters.values():
+            member = roster.members.get(key)
+            if member is not None and member.nickname:
+                return member.nickname
+        return ""
+
+    async def group_name(self, bot: BotClient, group_id: str) -> str:
+        group_id = str(group_id)
+        name = self._group_names.get(group_id)
+        if name:
+            return name
+        try:
+            info = await bot.api.get_group_info(group_id)
+            name = str(info.group_name)
+        except Exception:
+            return group_id
+        self._group_names[group_id] = name
+        return name
+
+    async def group_names(self, bot: BotClient, group_ids: list[str]) -> dict[str, str]:
+        if any(str(gid) not in self._group_names for gid in group_ids):
+            await self._load_group_names(bot)
+        return {gid: await self.group_name(bot, gid) for gid in group_ids}
+
+    def on_member_join(self, group_id: str, user_id: str | int, join_time: int = 0) -> None:
+        roster = self._rosters.get(str(group_id))
+        if roster is None or not str(user_id).isdigit():
+            return
+        key = int(user_id)
+        if key not in roster.members:
+            roster.members[key] = RosterMember(user_id = key, join_time = join_time or int(time.time()))
+
+    def discard(self, group_id: str, user_id: str | int) -> None:
+        roster = self._rosters.get(str(group_id))
+        if roster is not None and str(user_id).isdigit():
+            roster.members.pop(int(user_id), None)
+
+    def on_member_update(
+        self,
+        group_id: str,
+        user_id: str | int,
+        *,
+        card: str | None = None,
+        role: str | None = None,
+        nickname: str | None = None,
+        last_sent_time: int | None = None,
+    ) -> None:
+        roster = self._rosters.get(str(group_id))
+        if roster is None or not str(user_id).isdigit():
+            return
+        key = int(user_id)
+        member = roster.members.get(key)
+        if member is None:
+            # 镜像建立之后入群但漏掉了入群事件
+            member = RosterMember(user_id = key)
+            roster.members[key] = member
+        if card is not None:
+            member.card = card
+        if role:
+            member.role = role
+        if nickname:
+            member.nickname = nickname
+        if last_sent_time:
+            member.last_sent_time = last_sent_time
+
+    async def _roster(self, bot: BotClient, group_id: str, *, refresh: bool = False) -> _Roster | None:
+        cached = self._fresh(group_id)
+        if cached is not None and not refresh:
+            return cached
+
+        lock = self._locks.setdefault(group_id, asyncio.Lock())
+        async with lock:
+            cached = self._fresh(group_id)
+            if cached is not None and not refresh:
+                return cached
+            try:
+                async with self._fetch_semaphore:
+                    member_list = await bot.api.get_group_member_list(group_id)
+            except Exception:
+                LOGGER.warning("fetch group roster failed: group_id=%s", group_id)
+                return self._rosters.get(group_id)
+            roster = _Roster(fetched_at = time.monotonic())
+            for m in member_list.members:
+                if not str(m.user_id).isdigit():
+                    continue
+                roster.members[int(m.user_id)] = RosterMember(
+                    user_id = int(m.user_id),
+                    nickname = m.nickname or "",
+                    card = m.card or "",
+                    title = m.title or "",
+                    role = m.role or "member",
+                    join_time = int(m.join_time or 0),
+                    last_sent_time = int(m.last_sent_time or 0),
+                )
+            self._rosters[group_id] = roster
+            return roster
+
+    def _fresh(self, group_id: str) -> _Roster | None:
+        roster = self._rosters.get(group_id)
+        if roster is None:
+            return None
+        if self._ttl and time.monotonic() - roster.fetched_at > self._ttl:
+            return None
+        return roster
+
+    async def _load_group_names(self, bot: BotClient) -> None:
+        try:
+            groups = await bot.api.get_group_list(info = True)
+        except Exception:
+            LOGGER.warning("get group list failed")
+            return
+        for info in groups:
+            if isinstance(info, dict) and info.get("group_id") is not None:
+                self._group_names[str(info["group_id"])] = str(info.get("group_name") or info["group_id"])
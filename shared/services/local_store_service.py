@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from shared.config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LocalStoreService:
+    """无 R2 时的本地归档存储：按内容哈希只保存一份 blob，每个归档以原文件名硬链接到 blob。
+
+    目录结构：
+        store/blobs/<md5[:2]>/<md5>      内容本体
+        store/files/<md5>/<原文件名>      对外的归档路径（硬链接）
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+        self._root = Path(settings.archive_tmp_dir)
+        self._store_root = self._root / "store"
+
+    @property
+    def content_addressed(self) -> bool:
+        return self._settings.archive_local_store_cas
+
+    def _blob_path(self, content_hash: str) -> Path:
+        digest = content_hash.strip().lower()
+        return self._store_root / "blobs" / digest[:2] / digest
+
+    def _file_path(self, content_hash: str, file_name: str) -> Path:
+        return self._store_root / "files" / content_hash.strip().lower() / Path(file_name).name
+
+    def has_blob(self, content_hash: str) -> bool:
+        if not self.content_addressed or not content_hash:
+            return False
+        return self._blob_path(content_hash).exists()
+
+    async def put(self, source: Path, file_name: str, content_hash: str) -> tuple[Path, bool]:
+        """把 source 移入存储并返回 (归档路径, 是否新建)；source 会被移走或删除。"""
+        if not self.content_addressed or not content_hash:
+            return await asyncio.to_thread(self._put_flat, source, file_name), True
+        return await asyncio.to_thread(self._put_blob, source, file_name, content_hash)
+
+    async def link(self, file_name: str, content_hash: str) -> tuple[Path, bool]:
+        """内容已存在时只为新文件名建立链接，不再复制内容。"""
+        return await asyncio.to_thread(self._link, file_name, content_hash)
+
+    async def remove(self, path: Path) -> None:
+        """回滚用：删除归档路径；blob 不再被任何文件引用时一并删除。"""
+        await asyncio.to_thread(self._remove, path)
+
+    def _put_flat(self, source: Path, file_name: str) -> Path:
+        # 未开启内容寻址时保持旧布局 stored/<time_ns>/<原文件名>
+        store_dir = self._root / "stored" / str(time.time_ns())
+        store_dir.mkdir(parents = True, exist_ok = True)
+        target = store_dir / Path(file_name).name
+        if source != target:
+            shutil.move(str(source), str(target))
+        return target
+
+    def _put_blob(self, source: Path, file_name: str, content_hash: str) -> tuple[Path, bool]:
+        blob = self._blob_path(content_hash)
+        blob.parent.mkdir(parents = True, exist_ok = True)
+        if not blob.exists():
+            staging = blob.with_name(f".{blob.name}.{uuid.uuid4().hex}")
+            try:
+                shutil.move(str(source), str(staging))
+                try:
+                    # link 不会覆盖已存在的 blob，并发写入同一内容时先到者胜出
+                    os.link(staging, blob)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    os.replace(staging, blob)
+            finally:
+                staging.unlink(missing_ok = True)
+        else:
+            source.unlink(missing_ok = True)
+        return self._link(file_name, content_hash)
+
+    def _link(self, file_name: str, content_hash: str) -> tuple[Path, bool]:
+        blob = self._blob_path(content_hash)
+        target = self._file_path(content_hash, file_name)
+        if target.exists():
+            return target, False
+        target.parent.mkdir(parents = True, exist_ok = True)
+        try:
+            os.link(blob, target)
+        except FileExistsError:
+            return target, False
+        except OSError:
+            # 文件系统不支持硬链接时退化为复制
+            LOGGER.warning("hardlink not supported, fallback to copy: %s", target)
+            shutil.copy2(blob, target)
+        return target, True
+
+    def _remove(self, path: Path) -> None:
+        path.unlink(missing_ok = True)
+        try:
+            store_files = (self._store_root / "files").resolve()
+            if path.parent.resolve().parent != store_files:
+                return
+            blob = self._blob_path(path.parent.name)
+            # 只剩 blob 自身一个链接时说明已无归档引用
+            if blob.exists() and blob.stat().st_nlink <= 1:
+                blob.unlink(missing_ok = True)
+            if not any(path.parent.iterdir()):
+                path.parent.rmdir()
+        except OSError:
+            LOGGER.debug("cleanup local store failed: %s", path)
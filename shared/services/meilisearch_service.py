@@ -62,11 +62,8 @@ class MeiliSearchService:
             LOGGER.exception("MeiliSearch query failed: %s", query)
             return []
 
-    async def index_archived_file(self, item: ArchivedFile) -> None:
-        if not self.enabled:
-            return
-
-        doc = {
+    def _to_document(self, item: ArchivedFile) -> dict[str, Any]:
+        return {
             "id": item.id,
             "name": item.name,
             "senderId": item.sender_id,
@@ -79,10 +76,22 @@ class MeiliSearchService:
             "archiveDate": item.archive_date.isoformat(),
         }
 
+    async def index_archived_file(self, item: ArchivedFile) -> None:
+        await self.index_archived_files([item])
+
+    async def index_archived_files(self, items: list[ArchivedFile]) -> None:
+        if not self.enabled or not items:
+            return
+
+        docs = [self._to_document(item) for item in items]
+
         def _run() -> None:
-            self._index().add_documents([doc], primary_key = "id")
+            self._index().add_documents(docs, primary_key = "id")
 
         try:
             await asyncio.to_thread(_run)
         except Exception:
-            LOGGER.exception("MeiliSearch index failed for archive_id=%s", item.id)
+            LOGGER.exception(
+                "MeiliSearch index failed for archive_ids=%s",
+                ",".join(item.id for item in items),
+            )
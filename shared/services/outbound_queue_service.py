@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from ncatbot.core import BotClient
+
+from shared.config import Settings
+
+LOGGER = logging.getLogger(__name__)
+
+# 数值越小越优先：管理动作 > 交互回复 > 通知转发 > 定时报表
+PRIORITY_MODERATION = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_NOTICE = 2
+PRIORITY_REPORT = 3
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self._rate = max(0.01, rate)
+        self._burst = max(1.0, burst)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def ready(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= 1
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self._rate)
+
+
+@dataclass
+class _Job:
+    group_id: str
+    call: Callable[[], Awaitable[Any]]
+    kind: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory = time.monotonic)
+
+
+class OutboundQueueService:
+    """NapCat 出站调用的统一队列：全局 + 单群令牌桶限速，按优先级出队，同优先级内各群轮转。
+
+    调用方 await 返回值与异常与直接调用 bot.api 一致。
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._global = _TokenBucket(settings.outbound_global_rate, settings.outbound_global_burst)
+        self._group_rate = settings.outbound_group_rate
+        self._group_burst = settings.outbound_group_burst
+        self._group_buckets: dict[str, _TokenBucket] = {}
+        # priority -> group_id -> 待发任务；OrderedDict 的顺序即轮转顺序
+        self._queues: dict[int, OrderedDict[str, deque[_Job]]] = {}
+        self._pending = 0
+        self._inflight = asyncio.Semaphore(max(1, settings.outbound_concurrency))
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+        # 持有执行中任务的引用，避免被垃圾回收
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(
+        self,
+        group_id: str,
+        call: Callable[[], Awaitable[Any]],
+        *,
+        priority: int = PRIORITY_NOTICE,
+        kind: str = "call",
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        job = _Job(group_id = str(group_id), call = call, kind = kind, future = loop.create_future())
+        self._queues.setdefault(priority, OrderedDict()).setdefault(job.group_id, deque()).append(job)
+        self._pending += 1
+        if self._pending and self._pending % 50 == 0:
+            LOGGER.warning("outbound queue backlog: pending=%s", self._pending)
+        self._ensure_dispatcher()
+        self._wakeup.set()
+        return await job.future
+
+    async def post_group_msg(
+        self,
+        bot: BotClient,
+        group_id: str,
+        text: str | None = None,
+        *,
+        at: str | int | None = None,
+        priority: int = PRIORITY_NOTICE,
+    ) -> Any:
+        kwargs: dict[str, Any] = {"group_id": group_id, "text": text}
+        if at is not None:
+            kwargs["at"] = at
+        return await self.submit(
+            group_id,
+            lambda: bot.api.post_group_msg(**kwargs),
+            priority = priority,
+            kind = "post_group_msg",
+        )
+
+    async def set_group_kick(
+        self,
+        bot: BotClient,
+        group_id: str,
+        user_id: str,
+        *,
+        reject_add_request: bool = False,
+        priority: int = PRIORITY_MODERATION,
+    ) -> Any:
+        return await self.submit(
+            group_id,
+            lambda: bot.api.set_group_kick(
+                group_id = group_id,
+                user_id = user_id,
+                reject_add_request = reject_add_request,
+            ),
+            priority = priority,
+            kind = "set_group_kick",
+        )
+
+    async def set_essence_msg(
+        self,
+        bot: BotClient,
+        group_id: str,
+        message_id: Any,
+        *,
+        priority: int = PRIORITY_NOTICE,
+    ) -> Any:
+        return await self.submit(
+            group_id,
+            lambda: bot.api.set_essence_msg(message_id = message_id),
+            priority = priority,
+            kind = "set_essence_msg",
+        )
+
+    async def send_group_file(
+        self,
+        bot: BotClient,
+        group_id: str,
+        file: str,
+        *,
+        name: str | None = None,
+        priority: int = PRIORITY_REPORT,
+    ) -> Any:
+        return await self.submit(
+            group_id,
+            lambda: bot.api.send_group_file(group_id, file, name = name),
+            priority = priority,
+            kind = "send_group_file",
+        )
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _group_bucket(self, group_id: str) -> _TokenBucket:
+        bucket = self._group_buckets.get(group_id)
+        if bucket is None:
+            bucket = _TokenBucket(self._group_rate, self._group_burst)
+            self._group_buckets[group_id] = bucket
+        return bucket
+
+    def _pick(self, now: float) -> tuple[_Job | None, float | None]:
+        """选出下一个可发送的任务；没有时返回需要等待的秒数（None 表示队列已空）。"""
+        if not self._pending:
+            return None, None
+        if not self._global.ready(now):
+            return None, self._global.wait_time(now)
+
+        wait: float | None = None
+        for priority in sorted(self._queues):
+            groups = self._queues[priority]
+            for group_id in list(groups):
+                bucket = self._group_bucket(group_id)
+                if not bucket.ready(now):
+                    group_wait = bucket.wait_time(now)
+                    wait = group_wait if wait is None else min(wait, group_wait)
+                    continue
+                jobs = groups.pop(group_id)
+                job = jobs.popleft()
+                if jobs:
+                    # 放回末尾，同优先级内各群轮流出队
+                    groups[group_id] = jobs
+                self._pending -= 1
+                bucket.take(now)
+                self._global.take(now)
+                return job, None
+        return None, wait
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            job, wait = self._pick(time.monotonic())
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout = wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if job.future.done():
+                # 调用方已取消
+                continue
+            await self._inflight.acquire()
+            task = asyncio.create_task(self._execute(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: _Job) -> None:
+        waited = time.monotonic() - job.enqueued_at
+        if waited >= 5:
+            LOGGER.info("outbound call delayed: kind=%s group_id=%s waited=%.1fs", job.kind, job.group_id, waited)
+        try:
+            result = await job.call()
+        except Exception as exc:
+            if not job.future.done():
+                job.future.set_exception(exc)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            if not job.future.done():
+                # 执行被取消时让调用方也收到取消，而不是一直等待
+                job.future.cancel()
+            self._inflight.release()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
+
+from shared.config import Settings
+from shared.redis_client import get_redis
+
+LOGGER = logging.getLogger(__name__)
+
+_ENTRIES_KEY = "outbox:entries"
+
+
+@dataclass
+class OutboxEntry:
+    id: str
+    group_id: str
+    text: str
+    kind: str
+    essence: bool
+    created_at: float
+    expires_at: float
+
+
+class OutboxService:
+    """QQ 服务故障期间发送失败的群消息暂存到 Redis，恢复后按顺序补发。
+
+    collapse=True 的消息以 (kind, group_id) 为键，只保留最新一条，例如云盘密码与定时报表。
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._enabled = settings.outbox_enabled
+        self._ttl = max(60, settings.outbox_ttl_hours * 3600)
+        self._max_entries = max(1, settings.outbox_max_entries)
+        self._drain_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    async def enqueue(
+        self,
+        group_id: str,
+        text: str,
+        *,
+        kind: str,
+        collapse: bool = False,
+        essence: bool = False,
+    ) -> None:
+        if not self._enabled or not text:
+            return
+        now = time.time()
+        entry_id = f"{kind}:{group_id}" if collapse else f"{kind}:{group_id}:{uuid.uuid4().hex}"
+        entry = OutboxEntry(
+            id = entry_id,
+            group_id = str(group_id),
+            text = text,
+            kind = kind,
+            essence = essence,
+            created_at = now,
+            expires_at = now + self._ttl,
+        )
+        try:
+            redis = await get_redis()
+            await redis.hset(_ENTRIES_KEY, entry_id, json.dumps(asdict(entry), ensure_ascii = False))
+            LOGGER.info("outbox enqueued: id=%s", entry_id)
+            await self._trim(redis)
+        except Exception:
+            LOGGER.exception("outbox enqueue failed: kind=%s group_id=%s", kind, group_id)
+
+    async def pending(self) -> int:
+        try:
+            redis = await get_redis()
+            return int(await redis.hlen(_ENTRIES_KEY))
+        except Exception:
+            return 0
+
+    async def drain(self, deliver: Callable[[OutboxEntry], Awaitable[None]]) -> int:
+        """按入队时间补发；deliver 抛异常时视为仍在故障中，停止本轮并保留剩余消息。"""
+        if not self._enabled:
+            return 0
+        if self._drain_lock.locked():
+            return 0
+        async with self._drain_lock:
+            try:
+                redis = await get_redis()
+                raw_entries = await redis.hgetall(_ENTRIES_KEY)
+            except Exception:
+                LOGGER.exception("outbox load failed")
+                return 0
+
+            now = time.time()
+            entries: list[tuple[OutboxEntry, str]] = []
+            for entry_id, raw in raw_entries.items():
+                entry = self._decode(raw)
+                if entry is None or entry.expires_at <= now:
+                    LOGGER.info("outbox entry dropped: id=%s", entry_id)
+                    await self._remove(redis, entry_id, raw)
+                    continue
+                entries.append((entry, raw))
+            entries.sort(key = lambda item: item[0].created_at)
+
+            sent = 0
+            for entry, raw in entries:
+                try:
+                    await deliver(entry)
+                except Exception:
+                    LOGGER.warning(
+                        "outbox drain stopped: sent=%s remaining=%s",
+                        sent,
+                        len(entries) - sent,
+                        exc_info = True,
+                    )
+                    break
+                await self._remove(redis, entry.id, raw)
+                sent += 1
+            if sent:
+                LOGGER.info("outbox drained: sent=%s", sent)
+            return sent
+
+    @staticmethod
+    def _decode(raw: str) -> OutboxEntry | None:
+        try:
+            return OutboxEntry(**json.loads(raw))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    async def _remove(redis, entry_id: str, raw: str) -> None:
+        # 补发期间同键可能写入了更新的一条，只在内容未变时删除
+        try:
+            async with redis.pipeline(transaction = True) as pipe:
+                await pipe.watch(_ENTRIES_KEY)
+                if await pipe.hget(_ENTRIES_KEY, entry_id) == raw:
+                    pipe.multi()
+                    pipe.hdel(_ENTRIES_KEY, entry_id)
+                    await pipe.execute()
+                else:
+                    await pipe.unwatch()
+        except Exception:
+            LOGGER.warning("outbox remove failed: id=%s", entry_id)
+
+    async def _trim(self, redis) -> None:
+        if await redis.hlen(_ENTRIES_KEY) <= self._max_entries:
+            return
+        raw_entries = await redis.hgetall(_ENTRIES_KEY)
+
+        def _created_at(item: tuple[str, str]) -> float:
+            entry = self._decode(item[1])
+            return entry.created_at if entry is not None else 0.0
+
+        ordered = sorted(raw_entries.items(), key = _created_at)
+        overflow = [entry_id for entry_id, _ in ordered[: len(ordered) - self._max_entries]]
+        if overflow:
+            await redis.hdel(_ENTRIES_KEY, *overflow)
+            LOGGER.warning("outbox full, dropped oldest entries: count=%s", len(overflow))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from ncatbot.core import BotClient
+
+from shared.config import Settings
+from shared.services.group_roster_service import GroupRosterService
+from shared.services.qq_info_service import QQInfoService
+
+LOGGER = logging.getLogger(__name__)
+
+_AVATAR_URL = "https://q1.qlogo.cn/g?b=qq&nk={qq}&s=640"
+
+
+def avatar_url(qq: str | int) -> str:
+    return _AVATAR_URL.format(qq = str(qq).strip())
+
+
+class ProfileResolver:
+    """解析 QQ 昵称与头像：先查群成员镜像，再走 NapCat get_stranger_info，最后才用外部接口。
+
+    头像地址由 QQ 号直接拼出，不依赖任何接口。
+    """
+
+    def __init__(self, settings: Settings, roster: GroupRosterService, qq_info: QQInfoService) -> None:
+        self._roster = roster
+        self._qq_info = qq_info
+        self._use_external = settings.profile_external_fallback
+        self._semaphore = asyncio.Semaphore(max(1, settings.profile_resolve_concurrency))
+        self.stats = {"roster": 0, "napcat": 0, "external": 0}
+
+    def reset_stats(self) -> None:
+        self.stats = dict.fromkeys(self.stats, 0)
+
+    async def resolve(self, bot: BotClient, qq: str) -> tuple[str, str] | None:
+        """返回 (昵称, 头像)；外部接口异常时抛 QQInfoError，便于调用方退避。"""
+        key = str(qq).strip()
+        if not key.isdigit():
+            return None
+
+        nickname = self._roster.find_nickname(key)
+        if nickname:
+            self.stats["roster"] += 1
+            return nickname, avatar_url(key)
+
+        nickname = await self._stranger_nickname(bot, key)
+        if nickname:
+            self.stats["napcat"] += 1
+            return nickname, avatar_url(key)
+
+        if not self._use_external:
+            return None
+        info = await self._qq_info.fetch(key)
+        if info is None:
+            return None
+        self.stats["external"] += 1
+        return info[0], avatar_url(key)
+
+    async def _stranger_nickname(self, bot: BotClient, qq: str) -> str:
+        try:
+            async with self._semaphore:
+                data = await bot.api.get_stranger_info(qq)
+        except Exception:
+            LOGGER.debug("get stranger info failed: qq=%s", qq)
+            return ""
+        if not isinstance(data, dict):
+            return ""
+        return str(data.get("nickname") or data.get("nick") or "").strip()
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from shared.models.q_member import QMember
 
+_UPSERT_CHUNK_SIZE = 1000
+
 
 class QMemberService:
     def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
@@ -16,50 +21,57 @@ class QMemberService:
             rows = (await session.execute(stmt)).scalars().all()
             return list(rows)
 
+    async def list_qq_ids(self) -> set[str]:
+        async with self._session_factory() as session:
+            rows = (await session.execute(select(QMember.qq))).scalars().all()
+            return {str(qq) for qq in rows}
+
+    async def list_stale(self, before: datetime) -> list[str]:
+        """需要刷新的成员：资料缺失的优先，其余按 update_time 从旧到新。"""
+        missing = or_(QMember.nick_name == "", QMember.avatar_url == "")
+        async with self._session_factory() as session:
+            stmt = (
+                select(QMember.qq)
+                .where(or_(QMember.update_time < before, missing))
+                .order_by(case((missing, 0), else_ = 1), QMember.update_time)
+            )
+            rows = (await session.execute(stmt)).scalars().all()
+            return [str(qq) for qq in rows]
+
     async def upsert_many(self, records: list[tuple[str, str, str]]) -> tuple[int, int]:
-        if not records:
-            return 0, 0
+        """批量写入昵称与头像：按块发送多行 INSERT ... ON DUPLICATE KEY UPDATE。
 
-        qq_values = sorted(
-            {
-                int(str(item[0]).strip())
-                for item in records
-                if str(item[0]).strip().isdigit()
-            }
-        )
-        if not qq_values:
+        空昵称/头像不会覆盖已有值；已有的行都会刷新 update_time。返回 (更新数, 新增数)，
+        由影响行数推算：MySQL 对新增计 1、对更新计 2，不再额外查询。
+        """
+        latest: dict[int, tuple[str, str]] = {}
+        for qq, nick_name, avatar_url in records:
+            key = str(qq).strip()
+            if not key.isdigit():
+                continue
+            latest[int(key)] = ((nick_name or "").strip(), (avatar_url or "").strip())
+        if not latest:
             return 0, 0
 
+        updated = 0
+        created = 0
+        items = sorted(latest.items())
         async with self._session_factory() as session:
-            exists_stmt = select(QMember).where(QMember.qq.in_(qq_values))
-            exists_rows = (await session.execute(exists_stmt)).scalars().all()
-            exists_map = {str(row.qq): row for row in exists_rows}
-
-            updated = 0
-            created = 0
-            for qq, nick_name, avatar_url in records:
-                key = str(qq).strip()
-                if not key or not key.isdigit():
-                    continue
-                key_int = int(key)
-                nick = (nick_name or "").strip()
-                avatar = (avatar_url or "").strip()
-                row = exists_map.get(str(key_int))
-                if row is None:
-                    row = QMember(qq=key_int, nick_name=nick, avatar_url=avatar)
-                    session.add(row)
-                    exists_map[str(key_int)] = row
-                    created += 1
-                    continue
-                changed = False
-                if nick and row.nick_name != nick:
-                    row.nick_name = nick
-                    changed = True
-                if avatar and row.avatar_url != avatar:
-                    row.avatar_url = avatar
-                    changed = True
-                if changed:
-                    updated += 1
-
+            for start in range(0, len(items), _UPSERT_CHUNK_SIZE):
+                chunk = items[start:start + _UPSERT_CHUNK_SIZE]
+                stmt = mysql_insert(QMember).values(
+                    [{"qq": qq, "nick_name": nick, "avatar_url": avatar} for qq, (nick, avatar) in chunk]
+                )
+                stmt = stmt.on_duplicate_key_update(
+                    nick_name = func.if_(stmt.inserted.nick_name != "", stmt.inserted.nick_name, QMember.nick_name),
+                    avatar_url = func.if_(stmt.inserted.avatar_url != "", stmt.inserted.avatar_url, QMember.avatar_url),
+                    update_time = func.now(),
+                )
+                result = await session.execute(stmt)
+                # 影响行数 = 新增数 + 2 * 更新数；驱动未返回时按全部更新计
+                affected = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else 2 * len(chunk)
+                chunk_updated = min(len(chunk), max(0, affected - len(chunk)))
+                updated += chunk_updated
+                created += len(chunk) - chunk_updated
             await session.commit()
-            return updated, created
+        return updated, created
@@ -1,28 +1,61 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+from typing import Awaitable, Callable
 
 import httpx
 
 from shared.config import Settings
 
+LOGGER = logging.getLogger(__name__)
+
+# 连续失败达到该次数时认为接口不可用，提前结束本轮刷新
+_MAX_CONSECUTIVE_ERRORS = 20
+_MAX_BACKOFF = 60.0
+
+
+class QQInfoError(Exception):
+    """接口暂时不可用（网络错误、限流或 5xx），可稍后重试。"""
+
 
 class QQInfoService:
     def __init__(self, settings: Settings) -> None:
         self._api_base = settings.qq_info_api_url
+        self._concurrency = max(1, settings.qq_info_refresh_concurrency)
+        self._client: httpx.AsyncClient | None = None
 
-    async def get_info(self, qq: str) -> tuple[str, str] | None:
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout = 8.0,
+                limits = httpx.Limits(
+                    max_connections = self._concurrency * 2,
+                    max_keepalive_connections = self._concurrency,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, qq: str) -> tuple[str, str] | None:
+        """查询昵称与头像；查无此人返回 None，接口异常抛 QQInfoError。"""
         key = str(qq).strip()
         if not key or not self._api_base:
             return None
 
         url = f"{self._api_base}{key}"
         try:
-            async with httpx.AsyncClient(timeout=8.0) as client:
-                resp = await client.get(url)
-            if resp.status_code != 200 or not resp.text.strip():
-                return None
-        except Exception:
+            resp = await self._get_client().get(url)
+        except httpx.HTTPError as exc:
+            raise QQInfoError(str(exc) or type(exc).__name__) from exc
+        if resp.status_code == 429 or resp.status_code >= 500:
+            raise QQInfoError(f"status={resp.status_code}")
+        if resp.status_code != 200 or not resp.text.strip():
             return None
 
         data: dict
@@ -33,6 +66,8 @@ class QQInfoService:
                 data = json.loads(resp.text)
             except Exception:
                 return None
+        if not isinstance(data, dict):
+            return None
 
         nickname = str(data.get("nickname") or data.get("name") or "").strip()
         avatar = str(data.get("headimg") or data.get("avatar") or "").strip()
@@ -40,3 +75,67 @@ class QQInfoService:
             return None
         return nickname, avatar
 
+    async def refresh_many(
+        self,
+        qq_ids: list[str],
+        on_batch: Callable[[list[tuple[str, str, str]], list[str]], Awaitable[None]],
+        *,
+        fetch: Callable[[str], Awaitable[tuple[str, str] | None]] | None = None,
+        batch_size: int = 200,
+    ) -> int:
+        """并发查询一批 QQ，每满 batch_size 个回调一次 (查到的记录, 已处理的 QQ)。
+
+        fetch 默认直接查外部接口，也可传入 ProfileResolver.resolve 等自定义查询。
+        接口报错时所有 worker 共享退避时间：失败翻倍、成功减半；连续失败过多则提前结束。
+        返回已处理的 QQ 数。
+        """
+        fetch = fetch or self.fetch
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for qq in qq_ids:
+            queue.put_nowait(qq)
+
+        records: list[tuple[str, str, str]] = []
+        processed: list[str] = []
+        flush_lock = asyncio.Lock()
+        state = {"backoff": 0.0, "errors": 0, "done": 0, "aborted": False}
+
+        async def _flush(force: bool = False) -> None:
+            async with flush_lock:
+                if not processed or (not force and len(processed) < batch_size):
+                    return
+                batch_records, batch_ids = records[:], processed[:]
+                records.clear()
+                processed.clear()
+                await on_batch(batch_records, batch_ids)
+                state["done"] += len(batch_ids)
+
+        async def _worker() -> None:
+            while not state["aborted"]:
+                try:
+                    qq = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if state["backoff"]:
+                    await asyncio.sleep(state["backoff"])
+                try:
+                    info = await fetch(qq)
+                except QQInfoError as exc:
+                    state["errors"] += 1
+                    state["backoff"] = min(_MAX_BACKOFF, max(1.0, state["backoff"] * 2))
+                    if state["errors"] >= _MAX_CONSECUTIVE_ERRORS:
+                        state["aborted"] = True
+                        LOGGER.warning("qq info api keeps failing, stop refresh: last_error=%s", exc)
+                        return
+                    # 放回队尾稍后重试
+                    queue.put_nowait(qq)
+                    continue
+                state["errors"] = 0
+                state["backoff"] = state["backoff"] / 2 if state["backoff"] >= 0.5 else 0.0
+                if info is not None:
+                    records.append((qq, info[0], info[1]))
+                processed.append(qq)
+                await _flush()
+
+        await asyncio.gather(*(_worker() for _ in range(min(self._concurrency, max(1, len(qq_ids))))))
+        await _flush(force = True)
+        return state["done"]
@@ -3,9 +3,10 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable
 from zoneinfo import ZoneInfo
 
 from ncatbot.core import BotClient
@@ -30,16 +31,44 @@ _FAULT_KEYWORDS = (
 )
 
 
+def _log_listener_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        LOGGER.error("qq recovery listener failed", exc_info = task.exception())
+
+
 class QQMonitorService:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
         self._state_path = Path(settings.qq_fault_alarm_state_path)
         self._lock = asyncio.Lock()
+        # 内存中的状态是唯一数据源，文件只作持久化；None 表示尚未从文件加载
+        self._state: dict[str, Any] | None = None
+        self._flush_delay = max(0.0, settings.qq_fault_state_flush_seconds)
+        self._persist_task: asyncio.Task | None = None
+        # 每次变更递增；与已写盘的代数相同表示文件已是最新
+        self._generation = 0
+        self._written_generation = 0
+        self._write_lock = asyncio.Lock()
+        self._recovery_listeners: list[Callable[[], Awaitable[None]]] = []
         try:
             self._tz = ZoneInfo(settings.scheduler_timezone)
         except Exception:
             self._tz = None
 
+    def add_recovery_listener(self, listener: Callable[[], Awaitable[None]]) -> None:
+        """故障恢复后在后台调用，用于补发故障期间积压的消息。"""
+        if listener not in self._recovery_listeners:
+            self._recovery_listeners.append(listener)
+
+    async def is_active(self) -> bool:
+        async with self._lock:
+            return bool((await self._load_state()).get("active"))
+
+    def _notify_recovered(self) -> None:
+        for listener in self._recovery_listeners:
+            task = asyncio.create_task(listener())
+            task.add_done_callback(_log_listener_error)
+
     def _now_text(self) -> str:
         now = datetime.now(self._tz) if self._tz is not None else datetime.now()
         return now.strftime("%Y-%m-%d %H:%M:%S")
@@ -57,7 +86,13 @@ class QQMonitorService:
             "reset_skip_count": 0,
         }
 
-    def _load_state(self) -> dict[str, Any]:
+    async def _load_state(self) -> dict[str, Any]:
+        """返回内存中的状态（调用方需持有 self._lock 后原地修改）；首次访问时从文件加载。"""
+        if self._state is None:
+            self._state = await asyncio.to_thread(self._read_state_file)
+        return self._state
+
+    def _read_state_file(self) -> dict[str, Any]:
         state = self._default_state()
         if not self._state_path.exists():
             return state
@@ -74,14 +109,45 @@ class QQMonitorService:
         return state
 
     def _save_state(self, state: dict[str, Any]) -> None:
+        self._state = state
+        self._generation += 1
+        # 短时间内的多次变更合并为一次写盘
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist_later())
+
+    async def _persist_later(self) -> None:
+        # 写盘期间又有变更时继续下一轮，直到文件与内存一致；写失败则等下次变更再试
+        while True:
+            await asyncio.sleep(self._flush_delay)
+            if not await self.flush() or self._written_generation == self._generation:
+                return
+
+    async def flush(self) -> bool:
+        """把当前状态写盘；无变更时跳过。写盘失败返回 False。"""
+        async with self._write_lock:
+            if self._state is None or self._written_generation == self._generation:
+                return True
+            generation = self._generation
+            snapshot = dict(self._state)
+            if not await asyncio.to_thread(self._write_state_file, snapshot):
+                return False
+            self._written_generation = generation
+            return True
+
+    def _write_state_file(self, state: dict[str, Any]) -> bool:
         try:
             self._state_path.parent.mkdir(parents = True, exist_ok = True)
-            self._state_path.write_text(
-                json.dumps(state, ensure_ascii = False, indent = 2),
-                encoding = "utf-8",
-            )
+            # 先写临时文件并落盘再替换，进程崩溃时文件要么是旧状态要么是新状态
+            tmp_path = self._state_path.with_name(f"{self._state_path.name}.tmp")
+            with tmp_path.open("w", encoding = "utf-8") as f:
+                f.write(json.dumps(state, ensure_ascii = False, indent = 2))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._state_path)
         except Exception:
             LOGGER.exception("save qq monitor state failed: path=%s", self._state_path)
+            return False
+        return True
 
     def _message_from_error(self, error: Exception) -> str:
         raw = str(error).strip()
@@ -169,7 +235,7 @@ class QQMonitorService:
         error_text = self._message_from_error(error)
 
         async with self._lock:
-            state = self._load_state()
+            state = await self._load_state()
             became_active = not bool(state.get("active"))
             state["active"] = True
             state["failure_count"] = int(state.get("failure_count") or 0) + 1
@@ -203,15 +269,18 @@ class QQMonitorService:
             return True
 
         async with self._lock:
-            state = self._load_state()
+            state = await self._load_state()
             if state.get("active") and str(state.get("last_failed_at") or "") == snapshot_last_failed_at:
                 state["alert_delivered"] = True
                 self._save_state(state)
         return True
 
     async def report_recovery(self, bot: BotClient, *, scene: str, probe_group: str | None = None) -> bool:
+        # 调度器每次成功发送都会调用，无故障时直接返回，不加锁也不读盘
+        if self._state is not None and not self._state.get("active"):
+            return False
         async with self._lock:
-            state = self._load_state()
+            state = await self._load_state()
             if not state.get("active"):
                 return False
             snapshot_last_failed_at = str(state.get("last_failed_at") or "")
@@ -227,9 +296,12 @@ class QQMonitorService:
             return False
 
         async with self._lock:
-            latest = self._load_state()
-            if latest.get("active") and str(latest.get("last_failed_at") or "") == snapshot_last_failed_at:
-                self._save_state(self._default_state())
+            latest = await self._load_state()
+            if not latest.get("active") or str(latest.get("last_failed_at") or "") != snapshot_last_failed_at:
+                # 通知发出期间又有新的故障，状态保持不变，也不触发补发
+                return False
+            self._save_state(self._default_state())
+        self._notify_recovered()
         return True
 
     async def ensure_available_for_password_reset(self, bot: BotClient) -> bool:
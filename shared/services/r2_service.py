@@ -1,15 +1,111 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import hashlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import AsyncIterator, Callable
 from urllib.parse import urlparse
 
-import boto3
-from botocore.client import BaseClient
-from botocore.config import Config
-
 from shared.config import Settings
+from shared.utils.s3_client import S3Client
+
+LOGGER = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+# S3/R2 要求分片（最后一片除外）不小于 5MB
+_MIN_PART_SIZE = 5 * _MB
+_STREAM_CHUNK_SIZE = _MB
+
+
+class _ByteBudget:
+    """进程内所有上传共享的在途字节预算。
+
+    release 是同步的，可在 finally 或任务完成回调中调用，不会因取消而漏还。
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = max(1, limit)
+        self._used = 0
+        self._waiters: list[asyncio.Future] = []
+
+    async def acquire(self, amount: int) -> int:
+        # 单个上传超过总预算时按总预算占用，保证大文件仍可独占通过
+        amount = max(1, min(amount, self._limit))
+        while self._used + amount > self._limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self._used += amount
+        return amount
+
+    def release(self, amount: int) -> None:
+        self._used = max(0, self._used - amount)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class _UploadProgress:
+    """按 10% 粒度记录单个上传的进度，并统计吞吐。"""
+
+    def __init__(self, key: str, total: int) -> None:
+        self._key = key
+        self._total = max(0, total)
+        self._sent = 0
+        self._next_report = 10
+        self._started = time.monotonic()
+
+    def advance(self, amount: int) -> None:
+        self._sent += amount
+        if not self._total:
+            return
+        percent = self._sent * 100 // self._total
+        if percent < self._next_report:
+            return
+        self._next_report = (percent // 10 + 1) * 10
+        LOGGER.debug(
+            "r2 upload progress: key=%s sent=%s/%s (%s%%) rate=%.2fMB/s",
+            self._key,
+            self._sent,
+            self._total,
+            min(100, percent),
+            self.throughput / _MB,
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self._started, 1e-6)
+
+    @property
+    def throughput(self) -> float:
+        return self._sent / self.elapsed
+
+
+@dataclass
+class StreamUploadResult:
+    key: str
+    url: str
+    size: int
+    md5: str
+    # False 表示内容寻址下对象已存在、本次未新建，回滚时不可删除
+    created: bool = True
+
+
+def _read_range(path: Path, offset: int, size: int) -> bytes:
+    with path.open("rb") as f:
+        f.seek(offset)
+        return f.read(size)
 
 
 class R2Service:
@@ -21,26 +117,60 @@ class R2Service:
             and settings.r2_secret_key
             and settings.r2_bucket
         )
-        self._client: BaseClient | None = None
+        self._part_size = max(_MIN_PART_SIZE, settings.r2_multipart_chunk_mb * _MB)
+        self._multipart_threshold = max(_MIN_PART_SIZE, settings.r2_multipart_threshold_mb * _MB)
+        self._concurrency = max(1, settings.r2_upload_concurrency)
+        self._budget = _ByteBudget(settings.r2_max_inflight_mb * _MB)
+        self._client: S3Client | None = None
         if self._enabled:
-            self._client = boto3.client(
-                "s3",
-                endpoint_url=settings.r2_endpoint,
-                aws_access_key_id=settings.r2_access_key,
-                aws_secret_access_key=settings.r2_secret_key,
-                config=Config(signature_version="s3v4"),
+            self._client = S3Client(
+                settings.r2_endpoint,
+                settings.r2_access_key,
+                settings.r2_secret_key,
+                settings.r2_bucket,
+                region=settings.r2_region,
+                # 连接池需要覆盖多个上传的分片并发
+                max_connections=max(10, self._concurrency * 4),
+                max_attempts=settings.r2_max_attempts,
             )
 
     @property
     def enabled(self) -> bool:
         return self._enabled and self._client is not None
 
-    def _build_key(self, file_name: str) -> str:
-        date_path = datetime.now().strftime("%Y/%m/%d")
+    @property
+    def content_addressed(self) -> bool:
+        return self._settings.r2_content_addressed
+
+    def _build_key(self, file_name: str, content_hash: str = "") -> str:
+        digest = (content_hash or "").strip().lower()
+        if self.content_addressed and digest:
+            # 按内容哈希分目录，末级保留原文件名，保证归档 URL 仍以原名结尾
+            object_path = f"objects/{digest[:2]}/{digest}"
+        else:
+            object_path = datetime.now().strftime("%Y/%m/%d")
+        return self._prefixed_key(object_path, file_name)
+
+    def _prefixed_key(self, object_path: str, file_name: str) -> str:
         prefix = self._settings.r2_path_prefix.strip("/")
         if prefix:
-            return f"{prefix}/{date_path}/{file_name}"
-        return f"{date_path}/{file_name}"
+            return f"{prefix}/{object_path}/{file_name}"
+        return f"{object_path}/{file_name}"
+
+    def content_key(self, file_name: str, content_hash: str) -> str:
+        """内容寻址模式下返回对象 key；未开启或缺少哈希时返回空串。"""
+        name = Path((file_name or "").strip()).name
+        if not self.content_addressed or not name or not (content_hash or "").strip():
+            return ""
+        return self._build_key(name, content_hash)
+
+    def object_url(self, key: str) -> str:
+        return self._build_archive_url(key)
+
+    async def exists(self, key: str) -> bool:
+        if not self.enabled or not key:
+            return False
+        return await self._client.head_object(key) is not None  # type: ignore[union-attr]
 
     def _build_archive_url(self, key: str) -> str:
         base = (self._settings.alist_base_url or "").strip().rstrip("/")
@@ -55,26 +185,196 @@ class R2Service:
             path_key = f"{archive_prefix}/{path_key}"
         return f"{base}/{path_key}"
 
-    async def upload(self, local_path: str, object_name: str | None = None) -> tuple[str, str]:
+    async def _put_small(self, target: Path, key: str, size: int, progress: _UploadProgress) -> None:
+        async def _body() -> AsyncIterator[bytes]:
+            offset = 0
+            while offset < size:
+                chunk = await asyncio.to_thread(_read_range, target, offset, _STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+
+        reserved = await self._budget.acquire(min(size, _STREAM_CHUNK_SIZE))
+        try:
+            await self._client.put_object(key, _body, size)  # type: ignore[union-attr]
+        finally:
+            self._budget.release(reserved)
+        progress.advance(size)
+
+    async def _put_multipart(self, target: Path, key: str, size: int, progress: _UploadProgress) -> None:
+        client = self._client
+        if client is None:
+            raise RuntimeError("R2 is not configured.")
+        upload_id = await client.create_multipart_upload(key)
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def _part(number: int, offset: int) -> tuple[int, str]:
+            async with semaphore:
+                length = min(self._part_size, size - offset)
+                reserved = await self._budget.acquire(length)
+                try:
+                    body = await asyncio.to_thread(_read_range, target, offset, length)
+                    etag = await client.upload_part(key, upload_id, number, body)
+                finally:
+                    self._budget.release(reserved)
+                progress.advance(length)
+                return number, etag
+
+        tasks = [
+            asyncio.create_task(_part(number, offset))
+            for number, offset in enumerate(range(0, size, self._part_size), start=1)
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+            await client.complete_multipart_upload(key, upload_id, list(parts))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 未完成的分片会持续占用存储，失败或取消时必须中止
+            with contextlib.suppress(Exception):
+                await asyncio.shield(client.abort_multipart_upload(key, upload_id))
+            raise
+
+    async def upload(
+        self,
+        local_path: str,
+        object_name: str | None = None,
+        content_hash: str = "",
+    ) -> tuple[str, str]:
         if not self.enabled:
             raise RuntimeError("R2 is not configured.")
 
         target = Path(local_path)
         raw_name = (object_name or target.name or "").strip()
         target_name = Path(raw_name).name if raw_name else target.name
-        key = self._build_key(target_name)
+        key = self._build_key(target_name, content_hash)
+        size = target.stat().st_size
+        progress = _UploadProgress(key, size)
 
-        def _run() -> None:
-            self._client.upload_file(  # type: ignore[union-attr]
-                str(target),
-                self._settings.r2_bucket,
-                key,
-            )
-
-        await asyncio.to_thread(_run)
+        if size >= self._multipart_threshold:
+            await self._put_multipart(target, key, size, progress)
+        else:
+            await self._put_small(target, key, size, progress)
 
+        LOGGER.info(
+            "r2 upload finished: key=%s size=%s elapsed=%.2fs rate=%.2fMB/s",
+            key,
+            size,
+            progress.elapsed,
+            progress.throughput / _MB,
+        )
         return key, self._build_archive_url(key)
 
+    async def upload_stream(self, chunks: AsyncIterator[bytes], object_name: str) -> StreamUploadResult:
+        """边下载边分片上传并同时计算 md5，不落盘；内容寻址模式下先写入暂存 key，完成后复制到内容 key。"""
+        client = self._client
+        if not self.enabled or client is None:
+            raise RuntimeError("R2 is not configured.")
+
+        name = Path((object_name or "").strip()).name or "unknown.bin"
+        if self.content_addressed:
+            # 内容哈希要等流结束才知道，先写暂存 key
+            key = self._prefixed_key(f"staging/{uuid.uuid4().hex}", name)
+        else:
+            key = self._build_key(name)
+
+        digest = hashlib.md5()
+        size = 0
+        buffer = bytearray()
+        upload_id = ""
+        tasks: list[asyncio.Task] = []
+        semaphore = asyncio.Semaphore(self._concurrency)
+        progress = _UploadProgress(key, 0)
+
+        async def _part(number: int, body: bytes) -> tuple[int, str]:
+            etag = await client.upload_part(key, upload_id, number, body)
+            progress.advance(len(body))
+            return number, etag
+
+        def _release_when_done(reserved: int) -> Callable[[asyncio.Task], None]:
+            # 在完成回调中归还名额与预算：任务在开始执行前被取消时 finally 不会运行，回调仍会执行
+            def _release(_: asyncio.Task) -> None:
+                semaphore.release()
+                self._budget.release(reserved)
+
+            return _release
+
+        async def _flush(body: bytes) -> None:
+            nonlocal upload_id
+            if not upload_id:
+                upload_id = await client.create_multipart_upload(key)
+            # 分片并发已满时阻塞读取，对下载端形成背压，内存占用有上限
+            await semaphore.acquire()
+            try:
+                reserved = await self._budget.acquire(len(body))
+            except BaseException:
+                semaphore.release()
+                raise
+            task = asyncio.create_task(_part(len(tasks) + 1, body))
+            task.add_done_callback(_release_when_done(reserved))
+            tasks.append(task)
+
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                buffer.extend(chunk)
+                while len(buffer) >= self._part_size:
+                    body = bytes(buffer[:self._part_size])
+                    del buffer[:self._part_size]
+                    await _flush(body)
+                for task in tasks:
+                    if task.done() and not task.cancelled() and task.exception() is not None:
+                        raise task.exception()  # type: ignore[misc]
+            if upload_id:
+                if buffer:
+                    await _flush(bytes(buffer))
+                parts = await asyncio.gather(*tasks)
+                await client.complete_multipart_upload(key, upload_id, list(parts))
+            else:
+                # 不足一个分片的小文件直接单次 PUT
+                await client.put_object(key, bytes(buffer), len(buffer))
+                progress.advance(len(buffer))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if upload_id:
+                with contextlib.suppress(Exception):
+                    await asyncio.shield(client.abort_multipart_upload(key, upload_id))
+            raise
+
+        md5 = digest.hexdigest()
+        created = True
+        if self.content_addressed:
+            final_key = self._build_key(name, md5)
+            try:
+                if await client.head_object(final_key) is None:
+                    await client.copy_object(key, final_key)
+                else:
+                    created = False
+            finally:
+                with contextlib.suppress(Exception):
+                    await client.delete_object(key)
+            key = final_key
+
+        LOGGER.info(
+            "r2 stream upload finished: key=%s size=%s elapsed=%.2fs rate=%.2fMB/s",
+            key,
+            size,
+            progress.elapsed,
+            progress.throughput / _MB,
+        )
+        return StreamUploadResult(
+            key=key,
+            url=self._build_archive_url(key),
+            size=size,
+            md5=md5,
+            created=created,
+        )
+
     def _normalize_key(self, key_or_url: str) -> str:
         value = (key_or_url or "").strip()
         if not value:
@@ -101,10 +401,8 @@ class R2Service:
         if not key:
             return
 
-        def _run() -> None:
-            self._client.delete_object(  # type: ignore[union-attr]
-                Bucket=self._settings.r2_bucket,
-                Key=key,
-            )
+        await self._client.delete_object(key)  # type: ignore[union-attr]
 
-        await asyncio.to_thread(_run)
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
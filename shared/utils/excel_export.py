@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import AsyncIterable, Iterable
 
-from openpyxl import Workbook
+from shared.utils.stream_export import FORMAT_XLSX, export_rows, output_path
 
 
 INVALID_MEMBER_HEADERS = [
@@ -29,41 +29,46 @@ def _fmt_ts(ts: int | None) -> str:
         return ""
 
 
-def export_invalid_members_excel(
-    rows: Iterable[dict],
+def _invalid_member_row(row: dict) -> list:
+    return [
+        str(row.get("qq", "")),
+        row.get("card", ""),
+        row.get("nickname", ""),
+        row.get("title", ""),
+        str(row.get("group_id", "")),
+        row.get("group_name", ""),
+        _fmt_ts(row.get("last_sent_time")),
+        _fmt_ts(row.get("join_time")),
+        row.get("reason", ""),
+    ]
+
+
+async def export_invalid_members_excel(
+    rows: Iterable[dict] | AsyncIterable[dict],
     output_dir: str,
     title: str = "资源群失效人员名单",
+    fmt: str = FORMAT_XLSX,
 ) -> Path:
-    out_dir = Path(output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
     now = datetime.now()
-    file_name = f"{title}-{now.strftime('%Y%m%d-%H%M%S')}.xlsx"
-    target = out_dir / file_name
+    target = output_path(output_dir, f"{title}-{now.strftime('%Y%m%d-%H%M%S')}", fmt)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "invalid-members"
-    ws.append(INVALID_MEMBER_HEADERS)
+    async def _rows():
+        if hasattr(rows, "__aiter__"):
+            async for row in rows:
+                yield _invalid_member_row(row)
+        else:
+            for row in rows:
+                yield _invalid_member_row(row)
 
-    count = 0
-    for row in rows:
-        count += 1
-        ws.append(
-            [
-                str(row.get("qq", "")),
-                row.get("card", ""),
-                row.get("nickname", ""),
-                row.get("title", ""),
-                str(row.get("group_id", "")),
-                row.get("group_name", ""),
-                _fmt_ts(row.get("last_sent_time")),
-                _fmt_ts(row.get("join_time")),
-                row.get("reason", ""),
-            ]
-        )
+    def _footer(count: int) -> list[list]:
+        return [[], [f"数量：{count}", f"生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}"]]
 
-    ws.append([])
-    ws.append([f"数量：{count}", f"生成时间：{now.strftime('%Y-%m-%d %H:%M:%S')}"])
-    wb.save(target)
+    await export_rows(
+        _rows(),
+        target,
+        headers = INVALID_MEMBER_HEADERS,
+        fmt = fmt,
+        sheet_title = "invalid-members",
+        footer = _footer,
+    )
     return target
-
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_MB = 1024 * 1024
+_CONTENT_RANGE_TOTAL = re.compile(r"/\s*(\d+)\s*$")
+_HEX_MD5 = re.compile(r"^[0-9a-fA-F]{32}$")
+
+
+@dataclass(frozen = True)
+class DownloadOptions:
+    timeout: float = 120.0
+    # 每个 Range 分块大小与并发数；小于阈值的文件仍走单连接
+    chunk_size: int = 8 * _MB
+    concurrency: int = 4
+    ranged_threshold: int = 16 * _MB
+    max_attempts: int = 5
+
+
+def is_md5_hex(value: str) -> bool:
+    return bool(_HEX_MD5.match((value or "").strip()))
+
+
+def _write_at(path: Path, offset: int, data: bytes) -> None:
+    with path.open("r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def _allocate(path: Path, size: int) -> None:
+    with path.open("wb") as f:
+        f.truncate(size)
+
+
+def _load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding = "utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: Path, state: dict) -> None:
+    # 先写临时文件再替换，进程中途退出也不会留下损坏的状态文件
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(state), encoding = "utf-8")
+    os.replace(tmp_path, path)
+
+
+def _file_md5(path: Path) -> str:
+    digest = hashlib.md5()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _backoff(attempt: int) -> float:
+    return min(30.0, 1.0 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+async def _probe_size(client: httpx.AsyncClient, url: str) -> int:
+    """用 Range: bytes=0-0 探测总大小；服务端不支持 Range 时返回 0。"""
+    try:
+        async with client.stream("GET", url, headers = {"Range": "bytes=0-0"}) as response:
+            if response.status_code != 206:
+                return 0
+            match = _CONTENT_RANGE_TOTAL.search(response.headers.get("content-range", ""))
+            return int(match.group(1)) if match else 0
+    except httpx.HTTPError:
+        return 0
+
+
+async def _download_single(client: httpx.AsyncClient, url: str, target: Path) -> None:
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            with target.open("wb") as f:
+                async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                    await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        target.unlink(missing_ok = True)
+        raise
+
+
+async def _download_ranged(
+    client: httpx.AsyncClient,
+    url: str,
+    target: Path,
+    total: int,
+    options: DownloadOptions,
+    resume_key: str,
+) -> None:
+    partial_dir = target.parent / ".partial"
+    partial_dir.mkdir(parents = True, exist_ok = True)
+    name = hashlib.sha1((resume_key or url).encode("utf-8")).hexdigest()[:24]
+    data_path = partial_dir / f"{name}.part"
+    state_path = partial_dir / f"{name}.json"
+    chunk_size = max(_MB, options.chunk_size)
+
+    state = await asyncio.to_thread(_load_state, state_path)
+    if state.get("size") == total and state.get("chunk") == chunk_size and data_path.exists():
+        done = {int(i) for i in state.get("done", [])}
+        LOGGER.info("resume download: target=%s done=%s/%s", target.name, len(done), -(-total // chunk_size))
+    else:
+        done = set()
+        await asyncio.to_thread(_allocate, data_path, total)
+    state = {"url": url, "size": total, "chunk": chunk_size, "done": sorted(done)}
+    await asyncio.to_thread(_save_state, state_path, state)
+
+    semaphore = asyncio.Semaphore(max(1, options.concurrency))
+    state_lock = asyncio.Lock()
+
+    async def _chunk(index: int) -> None:
+        start = index * chunk_size
+        end = min(total, start + chunk_size) - 1
+        for attempt in range(1, options.max_attempts + 1):
+            try:
+                async with semaphore:
+                    offset = start
+                    async with client.stream("GET", url, headers = {"Range": f"bytes={start}-{end}"}) as response:
+                        if response.status_code != 206:
+                            raise httpx.HTTPStatusError(
+                                f"range request got status={response.status_code}",
+                                request = response.request,
+                                response = response,
+                            )
+                        async for data in response.aiter_bytes(_CHUNK_SIZE):
+                            if offset + len(data) > end + 1:
+                                raise httpx.ReadError("range response longer than requested")
+                            await asyncio.to_thread(_write_at, data_path, offset, data)
+                            offset += len(data)
+                    if offset != end + 1:
+                        raise httpx.ReadError(f"short range response: {offset - start}/{end - start + 1}")
+                break
+            except httpx.HTTPError as exc:
+                if attempt >= options.max_attempts:
+                    raise
+                delay = _backoff(attempt)
+                LOGGER.warning("download chunk failed, retry in %.1fs: chunk=%s error=%s", delay, index, exc)
+                await asyncio.sleep(delay)
+
+        async with state_lock:
+            done.add(index)
+            state["done"] = sorted(done)
+            await asyncio.to_thread(_save_state, state_path, state)
+
+    pending = [i for i in range(-(-total // chunk_size)) if i not in done]
+    tasks = [asyncio.create_task(_chunk(i)) for i in pending]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # 保留 .part 与状态文件，下次以相同 resume_key 下载时从断点继续
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+        raise
+
+    await asyncio.to_thread(os.replace, data_path, target)
+    state_path.unlink(missing_ok = True)
+
+
+async def download_file(
+    url: str,
+    target: Path,
+    options: DownloadOptions | None = None,
+    *,
+    expected_size: int = 0,
+    expected_md5: str = "",
+    resume_key: str = "",
+) -> Path:
+    """下载到目标文件：大文件按 Range 分块并发下载并可断点续传，最后校验大小与 md5。"""
+    options = options or DownloadOptions()
+    target.parent.mkdir(parents = True, exist_ok = True)
+    async with httpx.AsyncClient(
+        timeout = httpx.Timeout(options.timeout, connect = 15.0),
+        follow_redirects = True,
+        trust_env = False,
+        limits = httpx.Limits(max_connections = max(1, options.concurrency) + 1),
+    ) as client:
+        total = await _probe_size(client, url)
+        if expected_size > 0 and total > 0 and total != expected_size:
+            raise ValueError(f"remote size mismatch: expected={expected_size} actual={total}")
+        if total >= max(1, options.ranged_threshold):
+            await _download_ranged(client, url, target, total, options, resume_key)
+        else:
+            await _download_single(client, url, target)
+
+    try:
+        size = target.stat().st_size
+        if expected_size > 0 and size != expected_size:
+            raise ValueError(f"downloaded size mismatch: expected={expected_size} actual={size}")
+        if is_md5_hex(expected_md5):
+            actual = await asyncio.to_thread(_file_md5, target)
+            if actual != expected_md5.strip().lower():
+                raise ValueError(f"downloaded md5 mismatch: expected={expected_md5} actual={actual}")
+    except BaseException:
+        with contextlib.suppress(OSError):
+            target.unlink(missing_ok = True)
+        raise
+    return target
+
+
+async def stream_download(url: str, timeout: float = 120.0) -> AsyncIterator[bytes]:
+    """不落盘地按块读取远端文件。"""
+    async with httpx.AsyncClient(timeout = timeout, follow_redirects = True, trust_env = False) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                yield chunk
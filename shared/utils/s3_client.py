@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable
+from urllib.parse import quote, urlparse
+from xml.sax.saxutils import escape
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+
+# 请求体统一不参与签名：分片/流式上传无需预先计算 sha256，传输完整性由 HTTPS 保证
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+BodyFactory = Callable[[], AsyncIterator[bytes]]
+
+
+class S3Error(RuntimeError):
+    def __init__(self, operation: str, status: int, code: str = "", message: str = "") -> None:
+        self.operation = operation
+        self.status = status
+        self.code = code
+        super().__init__(f"{operation} failed: status={status}, code={code or '-'}, message={message or '-'}")
+
+
+def _xml_value(text: str, tag: str) -> str:
+    match = re.search(rf"<{tag}>(.*?)</{tag}>", text, flags = re.S)
+    return match.group(1).strip() if match else ""
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3Client:
+    """基于 httpx 的最小 S3 兼容客户端（SigV4 + path-style），覆盖归档所需的对象操作。"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        bucket: str,
+        *,
+        region: str = "auto",
+        max_connections: int = 20,
+        timeout: float = 120.0,
+        max_attempts: int = 5,
+    ) -> None:
+        parsed = urlparse(endpoint.strip())
+        self._base_url = f"{parsed.scheme or 'https'}://{parsed.netloc}"
+        self._host = parsed.netloc
+        self._base_path = parsed.path.rstrip("/")
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._bucket = bucket
+        self._region = region or "auto"
+        self._max_attempts = max(1, max_attempts)
+        self._http = httpx.AsyncClient(
+            base_url = self._base_url,
+            timeout = httpx.Timeout(timeout, connect = 10.0),
+            limits = httpx.Limits(
+                max_connections = max(1, max_connections),
+                max_keepalive_connections = max(1, max_connections),
+                keepalive_expiry = 60.0,
+            ),
+            trust_env = False,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    def _object_path(self, key: str) -> str:
+        return f"{self._base_path}/{quote(self._bucket, safe = '')}/{quote(key, safe = '/-_.~')}"
+
+    def _sign(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, str],
+        headers: dict[str, str],
+        payload_hash: str,
+    ) -> dict[str, str]:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+
+        signed = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+        signed["host"] = self._host
+        signed["x-amz-date"] = amz_date
+        signed["x-amz-content-sha256"] = payload_hash
+        header_names = sorted(signed)
+        canonical_headers = "".join(f"{name}:{signed[name]}\n" for name in header_names)
+        signed_headers = ";".join(header_names)
+        canonical_query = "&".join(
+            f"{quote(k, safe = '-_.~')}={quote(v, safe = '-_.~')}"
+            for k, v in sorted(params.items())
+        )
+        canonical_request = "\n".join(
+            [method, path, canonical_query, canonical_headers, signed_headers, payload_hash]
+        )
+        scope = f"{date_stamp}/{self._region}/s3/aws4_request"
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        key = _hmac(f"AWS4{self._secret_key}".encode("utf-8"), date_stamp)
+        key = _hmac(key, self._region)
+        key = _hmac(key, "s3")
+        key = _hmac(key, "aws4_request")
+        signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+        result = {k: v for k, v in signed.items() if k != "host"}
+        result["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return result
+
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        key: str,
+        *,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        body: bytes | BodyFactory | None = None,
+        ok_status: tuple[int, ...] = (200,),
+    ) -> httpx.Response:
+        path = self._object_path(key)
+        query = params or {}
+        payload_hash = _EMPTY_SHA256 if body is None else _UNSIGNED_PAYLOAD
+
+        for attempt in range(1, self._max_attempts + 1):
+            # 每次重试都要重新签名（x-amz-date）并重新生成流式请求体
+            content = body() if callable(body) else body
+            request_headers = self._sign(method, path, query, headers or {}, payload_hash)
+            try:
+                response = await self._http.request(
+                    method,
+                    path,
+                    params = query or None,
+                    headers = request_headers,
+                    content = content,
+                )
+            except httpx.TransportError as exc:
+                if attempt >= self._max_attempts:
+                    raise
+                delay = min(10.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                LOGGER.warning("%s transport error, retry in %.1fs: key=%s error=%s", operation, delay, key, exc)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in ok_status:
+                return response
+            if response.status_code in _RETRY_STATUS and attempt < self._max_attempts:
+                delay = min(10.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                LOGGER.warning(
+                    "%s got status=%s, retry in %.1fs: key=%s",
+                    operation,
+                    response.status_code,
+                    delay,
+                    key,
+                )
+                await asyncio.sleep(delay)
+                continue
+            text = response.text if method != "HEAD" else ""
+            raise S3Error(operation, response.status_code, _xml_value(text, "Code"), _xml_value(text, "Message"))
+
+        raise S3Error(operation, 0, message = "retries exhausted")
+
+    async def put_object(
+        self,
+        key: str,
+        body: bytes | BodyFactory,
+        content_length: int,
+        content_type: str | None = None,
+    ) -> str:
+        headers = {"content-length": str(content_length)}
+        if content_type:
+            headers["content-type"] = content_type
+        response = await self._request("PutObject", "PUT", key, headers = headers, body = body)
+        return response.headers.get("etag", "")
+
+    async def head_object(self, key: str) -> dict[str, str] | None:
+        response = await self._request("HeadObject", "HEAD", key, ok_status = (200, 404))
+        if response.status_code == 404:
+            return None
+        return dict(response.headers)
+
+    async def delete_object(self, key: str) -> None:
+        await self._request("DeleteObject", "DELETE", key, ok_status = (200, 204))
+
+    async def copy_object(self, source_key: str, key: str) -> None:
+        source = f"/{quote(self._bucket, safe = '')}/{quote(source_key, safe = '/-_.~')}"
+        response = await self._request("CopyObject", "PUT", key, headers = {"x-amz-copy-source": source})
+        # CopyObject 与 CompleteMultipartUpload 一样可能返回 200 但响应体为 Error
+        if "<Error>" in response.text:
+            raise S3Error(
+                "CopyObject",
+                response.status_code,
+                _xml_value(response.text, "Code"),
+                _xml_value(response.text, "Message"),
+            )
+
+    async def create_multipart_upload(self, key: str, content_type: str | None = None) -> str:
+        headers = {"content-type": content_type} if content_type else None
+        response = await self._request(
+            "CreateMultipartUpload",
+            "POST",
+            key,
+            params = {"uploads": ""},
+            headers = headers,
+        )
+        upload_id = _xml_value(response.text, "UploadId")
+        if not upload_id:
+            raise S3Error("CreateMultipartUpload", response.status_code, message = "empty UploadId")
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        response = await self._request(
+            "UploadPart",
+            "PUT",
+            key,
+            params = {"partNumber": str(part_number), "uploadId": upload_id},
+            headers = {"content-length": str(len(body))},
+            body = body,
+        )
+        etag = response.headers.get("etag", "")
+        if not etag:
+            raise S3Error("UploadPart", response.status_code, message = "missing ETag")
+        return etag
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+        items = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{escape(etag)}</ETag></Part>"
+            for number, etag in sorted(parts)
+        )
+        payload = f"<CompleteMultipartUpload>{items}</CompleteMultipartUpload>".encode("utf-8")
+        response = await self._request(
+            "CompleteMultipartUpload",
+            "POST",
+            key,
+            params = {"uploadId": upload_id},
+            headers = {"content-length": str(len(payload)), "content-type": "application/xml"},
+            body = payload,
+        )
+        # CompleteMultipartUpload 可能返回 200 但响应体为 Error
+        if "<Error>" in response.text:
+            raise S3Error(
+                "CompleteMultipartUpload",
+                response.status_code,
+                _xml_value(response.text, "Code"),
+                _xml_value(response.text, "Message"),
+            )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        await self._request(
+            "AbortMultipartUpload",
+            "DELETE",
+            key,
+            params = {"uploadId": upload_id},
+            ok_status = (200, 204, 404),
+        )
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Iterable, Sequence
+
+from openpyxl import Workbook
+
+FORMAT_XLSX = "xlsx"
+FORMAT_CSV = "csv"
+FORMAT_CSV_GZ = "csv.gz"
+FORMATS = (FORMAT_XLSX, FORMAT_CSV, FORMAT_CSV_GZ)
+
+_BATCH_SIZE = 1000
+_QUEUE_BATCHES = 8
+_DONE = object()
+_ABORT = object()
+
+Row = Sequence[Any]
+
+
+class _Writer:
+    """在工作线程中逐批写入；xlsx 使用 write_only 工作表，内存占用与行数无关。"""
+
+    def __init__(self, target: Path, fmt: str, sheet_title: str) -> None:
+        self._fmt = fmt
+        self._sheet_title = sheet_title
+        self._target = target
+        self._workbook: Workbook | None = None
+        self._sheet = None
+        self._file = None
+        self._csv = None
+
+    def open(self) -> None:
+        if self._fmt == FORMAT_XLSX:
+            self._workbook = Workbook(write_only = True)
+            self._sheet = self._workbook.create_sheet(self._sheet_title)
+            return
+        # utf-8-sig 让 Excel 直接打开 csv 时不乱码
+        if self._fmt == FORMAT_CSV_GZ:
+            self._file = gzip.open(self._target, "wt", encoding = "utf-8-sig", newline = "")
+        else:
+            self._file = self._target.open("w", encoding = "utf-8-sig", newline = "")
+        self._csv = csv.writer(self._file)
+
+    def write(self, rows: Iterable[Row]) -> None:
+        if self._sheet is not None:
+            for row in rows:
+                self._sheet.append(list(row))
+        else:
+            self._csv.writerows(rows)
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.save(self._target)
+            self._workbook = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _drain(
+    batches: queue.Queue,
+    closed: threading.Event,
+    target: Path,
+    fmt: str,
+    sheet_title: str,
+    headers: Row | None,
+    footer: Callable[[int], list[Row]] | None,
+) -> int:
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    writer = _Writer(tmp_path, fmt, sheet_title)
+    count = 0
+    try:
+        writer.open()
+        if headers:
+            writer.write([headers])
+        while True:
+            batch = batches.get()
+            if batch is _ABORT:
+                raise RuntimeError("export aborted by producer")
+            if batch is _DONE:
+                break
+            writer.write(batch)
+            count += len(batch)
+        if footer is not None:
+            writer.write(footer(count))
+        writer.close()
+        # 写完再替换，读取方不会看到写了一半的文件
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        tmp_path.unlink(missing_ok = True)
+        raise
+    finally:
+        closed.set()
+    return count
+
+
+def _blocking_put(batches: queue.Queue, closed: threading.Event, item: Any) -> bool:
+    """在线程中等待队列空位；写线程退出后返回 False，不会永久阻塞。"""
+    while not closed.is_set():
+        try:
+            batches.put(item, timeout = 1.0)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+async def _iterate(rows: AsyncIterable[Row] | Iterable[Row]):
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+def output_path(output_dir: str | Path, stem: str, fmt: str) -> Path:
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported export format: {fmt}")
+    directory = Path(output_dir)
+    directory.mkdir(parents = True, exist_ok = True)
+    return directory / f"{stem}.{fmt}"
+
+
+async def export_rows(
+    rows: AsyncIterable[Row] | Iterable[Row],
+    target: Path,
+    *,
+    headers: Row | None = None,
+    fmt: str = FORMAT_XLSX,
+    sheet_title: str = "Sheet1",
+    footer: Callable[[int], list[Row]] | None = None,
+) -> int:
+    """流式导出：行来自同步或异步迭代器，按批交给工作线程写文件，返回数据行数。
+
+    事件循环只负责产出行；序列化与磁盘写入都在线程中完成，队列有界，内存占用恒定。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported export format: {fmt}")
+    target.parent.mkdir(parents = True, exist_ok = True)
+    batches: queue.Queue = queue.Queue(maxsize = _QUEUE_BATCHES)
+    closed = threading.Event()
+    writer_task = asyncio.create_task(
+        asyncio.to_thread(_drain, batches, closed, target, fmt, sheet_title, headers, footer)
+    )
+    loop = asyncio.get_running_loop()
+
+    async def _put(item: Any) -> None:
+        # 队列未满时直接放入；满了在线程中阻塞等待，不轮询事件循环
+        if not closed.is_set():
+            try:
+                batches.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            if await loop.run_in_executor(None, _blocking_put, batches, closed, item):
+                return
+        # 写线程已异常退出，直接抛出它的异常
+        await writer_task
+        raise RuntimeError("export writer exited early")
+
+    batch: list[Row] = []
+    try:
+        async for row in _iterate(rows):
+            batch.append(row)
+            if len(batch) >= _BATCH_SIZE:
+                await _put(batch)
+                batch = []
+        if batch:
+            await _put(batch)
+        await _put(_DONE)
+    except BaseException:
+        try:
+            if not writer_task.done():
+                await _put(_ABORT)
+            await writer_task
+        except Exception:
+            pass
+        raise
+    return await writer_task
@@ -1,22 +1,79 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import os
 import shutil
 import subprocess
 import tempfile
 import zipfile
+from dataclasses import dataclass
 from pathlib import Path
 
 from shared.utils.text_watermark import apply_text_watermark
 
 
-def _run_command(args: list[str], cwd: Path | None = None) -> None:
-    subprocess.run(
-        args,
-        cwd = str(cwd) if cwd is not None else None,
-        check = True,
-        stdout = subprocess.DEVNULL,
-        stderr = subprocess.DEVNULL,
-    )
+@dataclass(frozen = True)
+class ArchiveCommandOptions:
+    # timeout <= 0 表示不限时；concurrency/threads <= 0 表示按 CPU 核数自动取值
+    timeout: float = 600.0
+    concurrency: int = 0
+    compression_level: int = 5
+    threads: int = 0
+
+
+_command_semaphore: asyncio.Semaphore | None = None
+
+
+def _resolve_concurrency(value: int) -> int:
+    if value > 0:
+        return value
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _get_command_semaphore(options: ArchiveCommandOptions) -> asyncio.Semaphore:
+    # 全局共享：所有归档任务的 7z/rar 子进程总数受同一上限约束
+    global _command_semaphore
+    if _command_semaphore is None:
+        _command_semaphore = asyncio.Semaphore(_resolve_concurrency(options.concurrency))
+    return _command_semaphore
+
+
+async def _kill_process(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    with contextlib.suppress(ProcessLookupError):
+        proc.kill()
+    with contextlib.suppress(Exception):
+        await proc.wait()
+
+
+async def _run_command(args: list[str], options: ArchiveCommandOptions, cwd: Path | None = None) -> None:
+    async with _get_command_semaphore(options):
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            cwd = str(cwd) if cwd is not None else None,
+            stdin = subprocess.DEVNULL,
+            stdout = subprocess.DEVNULL,
+            stderr = subprocess.PIPE,
+        )
+        timeout = options.timeout if options.timeout > 0 else None
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout = timeout)
+        except TimeoutError as exc:
+            await _kill_process(proc)
+            raise RuntimeError(f"archive command timed out after {options.timeout}s: {args[0]}") from exc
+        except BaseException:
+            # 任务被取消时也要回收子进程，避免遗留占满 CPU 的 7z/rar
+            await _kill_process(proc)
+            raise
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode or -1,
+            args,
+            stderr = (stderr or b"")[-2000:],
+        )
 
 
 def _find_cmd(*names: str) -> str:
@@ -27,8 +84,20 @@ def _find_cmd(*names: str) -> str:
     raise RuntimeError(f"required command not found: {', '.join(names)}")
 
 
-def _repack_zip(source_dir: Path, output_path: Path) -> None:
-    with zipfile.ZipFile(output_path, mode = "w", compression = zipfile.ZIP_DEFLATED) as zf:
+def _compression_level(options: ArchiveCommandOptions, upper: int = 9) -> int:
+    level = min(9, max(0, options.compression_level))
+    if upper == 9:
+        return level
+    return round(level * upper / 9)
+
+
+def _repack_zip(source_dir: Path, output_path: Path, options: ArchiveCommandOptions) -> None:
+    with zipfile.ZipFile(
+        output_path,
+        mode = "w",
+        compression = zipfile.ZIP_DEFLATED,
+        compresslevel = _compression_level(options),
+    ) as zf:
         for item in source_dir.rglob("*"):
             if item.is_dir():
                 continue
@@ -36,65 +105,100 @@ def _repack_zip(source_dir: Path, output_path: Path) -> None:
             zf.write(item, arcname)
 
 
-def _extract_archive(input_path: Path, extract_dir: Path) -> None:
+def _extract_zip(input_path: Path, extract_dir: Path) -> None:
+    with zipfile.ZipFile(input_path, mode = "r") as zf:
+        zf.extractall(extract_dir)
+
+
+async def _extract_archive(input_path: Path, extract_dir: Path, options: ArchiveCommandOptions) -> None:
     suffix = input_path.suffix.lower()
     if suffix == ".zip":
-        with zipfile.ZipFile(input_path, mode = "r") as zf:
-            zf.extractall(extract_dir)
+        await asyncio.to_thread(_extract_zip, input_path, extract_dir)
         return
 
     if suffix == ".7z":
         cmd = _find_cmd("7z", "7zz")
-        _run_command([cmd, "x", "-y", f"-o{extract_dir}", str(input_path)])
+        await _run_command([cmd, "x", "-y", f"-o{extract_dir}", str(input_path)], options)
         return
 
     if suffix == ".rar":
         unrar = shutil.which("unrar")
         if unrar:
-            _run_command([unrar, "x", "-o+", str(input_path), str(extract_dir)])
+            await _run_command([unrar, "x", "-o+", str(input_path), str(extract_dir)], options)
             return
         cmd = _find_cmd("7z", "7zz")
-        _run_command([cmd, "x", "-y", f"-o{extract_dir}", str(input_path)])
+        await _run_command([cmd, "x", "-y", f"-o{extract_dir}", str(input_path)], options)
         return
 
     raise RuntimeError(f"unsupported archive suffix: {suffix}")
 
 
-def _repack_archive(source_dir: Path, output_path: Path) -> None:
+async def _repack_archive(source_dir: Path, output_path: Path, options: ArchiveCommandOptions) -> None:
     suffix = output_path.suffix.lower()
     if suffix == ".zip":
-        _repack_zip(source_dir, output_path)
+        await asyncio.to_thread(_repack_zip, source_dir, output_path, options)
         return
 
     if suffix == ".7z":
         cmd = _find_cmd("7z", "7zz")
-        _run_command([cmd, "a", "-t7z", "-y", str(output_path), "."], cwd = source_dir)
+        threads = f"-mmt={options.threads}" if options.threads > 0 else "-mmt=on"
+        await _run_command(
+            [cmd, "a", "-t7z", "-y", f"-mx={_compression_level(options)}", threads, str(output_path), "."],
+            options,
+            cwd = source_dir,
+        )
         return
 
     if suffix == ".rar":
         rar = shutil.which("rar")
         if not rar:
             raise RuntimeError("required command not found: rar")
-        _run_command([rar, "a", "-idq", str(output_path), "."], cwd = source_dir)
+        args = [rar, "a", "-idq", f"-m{_compression_level(options, upper = 5)}"]
+        if options.threads > 0:
+            args.append(f"-mt{min(64, options.threads)}")
+        args.extend([str(output_path), "."])
+        await _run_command(args, options, cwd = source_dir)
         return
 
     raise RuntimeError(f"unsupported archive suffix: {suffix}")
 
 
-def apply_archive_txt_watermark(input_path: Path, output_path: Path, watermark_text: str, times: int = 3) -> Path:
-    with tempfile.TemporaryDirectory(prefix = "shareusbot-wm-") as temp_dir:
-        temp_root = Path(temp_dir)
-        _extract_archive(input_path, temp_root)
-
-        for txt_file in temp_root.rglob("*.txt"):
-            tmp_output = txt_file.with_name(f"{txt_file.stem}.tmp{txt_file.suffix}")
-            apply_text_watermark(txt_file, tmp_output, watermark_text, times = times)
-            shutil.move(str(tmp_output), str(txt_file))
-
-        _repack_archive(temp_root, output_path)
+def _watermark_txt_files(root: Path, watermark_text: str, times: int) -> None:
+    for txt_file in root.rglob("*.txt"):
+        tmp_output = txt_file.with_name(f"{txt_file.stem}.tmp{txt_file.suffix}")
+        apply_text_watermark(txt_file, tmp_output, watermark_text, times = times)
+        shutil.move(str(tmp_output), str(txt_file))
+
+
+async def apply_archive_txt_watermark(
+    input_path: Path,
+    output_path: Path,
+    watermark_text: str,
+    times: int = 3,
+    options: ArchiveCommandOptions | None = None,
+) -> Path:
+    opts = options or ArchiveCommandOptions()
+    temp_root = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix = "shareusbot-wm-"))
+    try:
+        await _extract_archive(input_path, temp_root, opts)
+        await asyncio.to_thread(_watermark_txt_files, temp_root, watermark_text, times)
+        try:
+            await _repack_archive(temp_root, output_path, opts)
+        except BaseException:
+            # 超时/取消时打包产物不完整，不能留给后续上传
+            output_path.unlink(missing_ok = True)
+            raise
+    finally:
+        await asyncio.to_thread(shutil.rmtree, temp_root, True)
     return output_path
 
 
-def apply_zip_txt_watermark(input_path: Path, output_path: Path, watermark_text: str, times: int = 3) -> Path:
+async def apply_zip_txt_watermark(
+    input_path: Path,
+    output_path: Path,
+    watermark_text: str,
+    times: int = 3,
+    options: ArchiveCommandOptions | None = None,
+) -> Path:
     # Backward-compatible name used by existing imports; now supports zip/7z/rar by suffix.
-    return apply_archive_txt_watermark(input_path, output_path, watermark_text, times = times)
+    return await apply_archive_txt_watermark(input_path, output_path, watermark_text, times = times, options = options)